@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Local fake HashDB server for benchmarks and load tests.
+
+Every hash value resolves to a synthetic API name, so results are
+ deterministic without a real database. Latency, error rate, miss rate and
+ response sizes are configurable:
+    python -m benchmarks.mock_server --port 8080 --latency 0.02 --error-rate 0.01
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The first algorithm isn't implemented by the local engine (see hashdb_core.local),
+#  lookups with it always reach the server
+ALGORITHMS = [
+    {"algorithm": "mock_hash32", "type": "unsigned_int"},
+    {"algorithm": "crc32", "type": "unsigned_int"},
+    {"algorithm": "ror13_add", "type": "unsigned_int"},
+    {"algorithm": "fnv1a_64", "type": "unsigned_long"},
+]
+
+
+def synthetic_string(hash_value: int) -> dict:
+    name = "Api_%x" % hash_value
+    return {"string": name, "is_api": True, "permutation": "api", "api": name, "modules": ["mockmodule"]}
+
+
+class MockHashDBHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real service
+    disable_nagle_algorithm = True # Headers and body are written separately
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def begin(self) -> bool:
+        """
+        Simulate the latency and errors, returns False if an error was sent.
+        """
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if server.error_rate and random.random() < server.error_rate:
+            with server.lock:
+                server.error_count += 1
+            self.send_json(503, {"error": "simulated failure"})
+            return False
+        return True
+
+    def lookup(self, hash_value: int) -> list:
+        server = self.server
+        # Misses are deterministic, so repeated runs return the same results
+        if server.miss_rate and (hash_value * 2654435761 & 0xFFFF) / 0x10000 < server.miss_rate:
+            return []
+        return [{"hash": hash_value, "string": synthetic_string(hash_value)}
+                for _ in range(server.collisions)]
+
+    def do_GET(self):
+        if not self.begin():
+            return
+        path = self.path.split("?")[0]
+        if path == "/hash":
+            self.send_json(200, {"algorithms": ALGORITHMS})
+            return
+        match = re.fullmatch(r"/hash/([^/]+)/(\d+)", path)
+        if match:
+            self.send_json(200, {"hashes": self.lookup(int(match.group(2)))})
+            return
+        match = re.fullmatch(r"/module/([^/]+)/([^/]+)/([^/]+)", path)
+        if match:
+            hashes = [{"hash": index, "string": synthetic_string(index)} for index in range(self.server.module_size)]
+            self.send_json(200, {"hashes": hashes})
+            return
+        self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.begin():
+            return
+        path = self.path.split("?")[0]
+        if path == "/hunt":
+            # Like the service, one hit per algorithm with the number of matched hashes
+            hash_values = body.get("hashes", [])
+            hits = [{"algorithm": algorithm["algorithm"], "count": len(hash_values), "hitrate": 1.0 if hash_values else 0.0}
+                    for algorithm in ALGORITHMS[:self.server.hunt_hits]]
+            self.send_json(200, {"hits": hits})
+            return
+        if re.fullmatch(r"/hash/[^/]+", path):
+            if not self.server.bulk:
+                self.send_json(405, {"error": "bulk lookups disabled"})
+                return
+            hashes = []
+            for hash_value in body.get("hashes", []):
+                hashes.extend(self.lookup(hash_value))
+            self.send_json(200, {"hashes": hashes})
+            return
+        self.send_json(404, {"error": "not found"})
+
+
+class MockHashDBServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, latency: float = 0, error_rate: float = 0, miss_rate: float = 0,
+                 collisions: int = 1, module_size: int = 1000, hunt_hits: int = 1, bulk: bool = True):
+        super().__init__(("127.0.0.1", port), MockHashDBHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.miss_rate = miss_rate
+        self.collisions = collisions
+        self.module_size = module_size
+        self.hunt_hits = hunt_hits
+        self.bulk = bulk
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:{}".format(self.server_address[1])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def reset_counters(self):
+        with self.lock:
+            self.request_count = 0
+            self.error_count = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake HashDB server")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of requests failing with 503")
+    parser.add_argument("--miss-rate", type=float, default=0, help="fraction of hashes without a result")
+    parser.add_argument("--collisions", type=int, default=1, help="results returned per hash")
+    parser.add_argument("--module-size", type=int, default=1000, help="hashes returned per module")
+    parser.add_argument("--no-bulk", action="store_true", help="reject bulk lookups (405)")
+    arguments = parser.parse_args()
+    server = MockHashDBServer(arguments.port, arguments.latency, arguments.error_rate, arguments.miss_rate,
+                              arguments.collisions, arguments.module_size, bulk=not arguments.no_bulk)
+    print("Mock HashDB server listening on {}".format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the HashDB core against the local mock server, e.g.:
+    python -m benchmarks.run_benchmarks --sizes 10 100 1000 10000 --latency 0.005
+    python -m benchmarks.run_benchmarks --output results.json
+    python -m benchmarks.run_benchmarks --baseline results.json --threshold 0.25
+
+Every scenario reports latency percentiles, operations and requests per
+ second, and the peak memory allocated while it ran (tracemalloc).
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+import hashdb_core
+from hashdb_core import config
+
+from .mock_server import MockHashDBServer
+
+# Only known to the mock server, so the local engine can't answer the lookups
+ALGORITHM = "mock_hash32"
+
+
+def percentile(samples: list, fraction: float) -> float:
+    """Nearest rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))]
+
+
+def generate_iat(size: int, seed: int = 0) -> list:
+    """A synthetic import address table block: `size` unique 32 bit hash values."""
+    generator = random.Random(seed + size)
+    return generator.sample(range(0x10000, 0xFFFFFFFF), size)
+
+
+def measure(name: str, server: MockHashDBServer, operation, repeats: int) -> dict:
+    """
+    Run an operation `repeats` times, returns the statistics of the runs.
+    """
+    server.reset_counters()
+    samples = []
+    failures = 0
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        operation_start = time.perf_counter()
+        try:
+            operation()
+        except (requests.RequestException, hashdb_core.HashDBError):
+            failures += 1
+        samples.append(time.perf_counter() - operation_start)
+    elapsed = time.perf_counter() - start_time
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "name": name,
+        "repeats": repeats,
+        "p50": percentile(samples, 0.50),
+        "p90": percentile(samples, 0.90),
+        "p99": percentile(samples, 0.99),
+        "operations_per_second": repeats / elapsed if elapsed else 0,
+        "requests": server.request_count,
+        "requests_per_second": server.request_count / elapsed if elapsed else 0,
+        "errors": server.error_count,
+        "failures": failures,
+        "peak_memory": peak_memory,
+    }
+
+
+def run_benchmarks(arguments) -> list:
+    server_options = dict(latency=arguments.latency, error_rate=arguments.error_rate,
+                          miss_rate=arguments.miss_rate, module_size=arguments.module_size)
+    bulk_server = MockHashDBServer(**server_options).start()
+    single_server = MockHashDBServer(bulk=False, **server_options).start()
+    results = []
+    try:
+        # Single hash lookups (hash lookup action)
+        values = iter(generate_iat(arguments.repeats * 10))
+        results.append(measure("lookup", bulk_server,
+                               lambda: hashdb_core.get_strings_from_hash(ALGORITHM, next(values), 0, bulk_server.url),
+                               arguments.repeats * 10))
+
+        # IAT scans, bulk requests and per hash fallback
+        for size in arguments.sizes:
+            iat = generate_iat(size)
+            results.append(measure("scan_bulk[{}]".format(size), bulk_server,
+                                   lambda: hashdb_core.get_strings_from_hashes(ALGORITHM, iat, 0, bulk_server.url),
+                                   arguments.repeats))
+            if size <= arguments.max_fallback_size:
+                results.append(measure("scan_fallback[{}]".format(size), single_server,
+                                       lambda: hashdb_core.get_strings_from_hashes(ALGORITHM, iat, 0, single_server.url),
+                                       arguments.repeats))
+
+        # Algorithm hunting
+        values = iter(generate_iat(arguments.repeats * 10, seed=1))
+        results.append(measure("hunt", bulk_server,
+                               lambda: hashdb_core.hunt_hash(next(values), bulk_server.url),
+                               arguments.repeats * 10))
+
+        # Module imports, the response is streamed and parsed incrementally
+        def import_module():
+            for _ in hashdb_core.iter_module_hashes("mockmodule", ALGORITHM, "api", bulk_server.url):
+                pass
+        results.append(measure("module_import[{}]".format(arguments.module_size), bulk_server,
+                               import_module, arguments.repeats))
+    finally:
+        bulk_server.stop()
+        single_server.stop()
+        hashdb_core.close_session()
+    return results
+
+
+def print_results(results: list):
+    header = "{:<24} {:>10} {:>10} {:>10} {:>10} {:>10} {:>8} {:>8} {:>10}".format(
+        "scenario", "p50 ms", "p90 ms", "p99 ms", "ops/s", "req/s", "errors", "failed", "peak KiB")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print("{:<24} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.1f} {:>10.1f} {:>8} {:>8} {:>10.1f}".format(
+            result["name"], result["p50"] * 1000, result["p90"] * 1000, result["p99"] * 1000,
+            result["operations_per_second"], result["requests_per_second"], result["errors"],
+            result["failures"], result["peak_memory"] / 1024))
+
+
+def find_regressions(results: list, baseline: list, threshold: float) -> list:
+    """
+    Returns the scenarios whose median latency grew more than `threshold`
+     (a fraction) compared to the baseline results.
+    """
+    baseline = {result["name"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["name"], None)
+        if previous is not None and previous["p50"] and result["p50"] > previous["p50"] * (1 + threshold):
+            regressions.append((result["name"], previous["p50"], result["p50"]))
+    return regressions
+
+
+def main(arguments: list = None) -> int:
+    parser = argparse.ArgumentParser(description="HashDB benchmarks against a local mock server")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="number of entries in the synthetic IAT blocks")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per scenario")
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to every mock request")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of mock requests failing with 503")
+    parser.add_argument("--miss-rate", type=float, default=0.1, help="fraction of hashes without a result")
+    parser.add_argument("--module-size", type=int, default=5000, help="hashes returned per module")
+    parser.add_argument("--max-fallback-size", type=int, default=1000,
+                        help="largest IAT block resolved with one request per hash")
+    parser.add_argument("--output", help="write the results to a JSON file")
+    parser.add_argument("--baseline", help="compare against the results of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed median latency increase over the baseline")
+    arguments = parser.parse_args(arguments)
+
+    # Measure the client and server only, no cache or local shortcuts
+    config.configure(use_cache=False, offline=False, data_directory=tempfile.mkdtemp(prefix="hashdb-benchmark-"))
+
+    results = run_benchmarks(arguments)
+    print_results(results)
+    if arguments.output:
+        with open(arguments.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if arguments.baseline:
+        with open(arguments.baseline, "r") as baseline_file:
+            regressions = find_regressions(results, json.load(baseline_file), arguments.threshold)
+        for name, previous, current in regressions:
+            print("REGRESSION: {} p50 {:.2f} ms -> {:.2f} ms".format(name, previous * 1000, current * 1000))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
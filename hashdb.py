@@ -49,6 +49,14 @@ import ida_name
 import ida_enum
 import ida_bytes
 import ida_netnode
+import ida_diskio
+import ida_ua
+import ida_funcs
+import ida_hexrays
+import ida_auto
+import ida_ida
+import ida_nalt
+import idautils
 
 # Imports for the exception handler
 import traceback
@@ -173,13 +181,27 @@ sys.excepthook = hashdb_exception_hook
 
 # Rest of the imports
 import functools
+import os
+import struct
+import time
 import requests
 import string
 from typing import Union
 
+# The IDA independent core library is shipped next to the plugin
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import hashdb_core
+from hashdb_core import (HashDBError, LOCAL_ALGORITHMS, COLLISION_POLICIES,
+                         get_cache, close_cache, close_hash_indexes, hunt_local_hashes, solve_xor_key,
+                         get_session, close_session, get_cached_algorithms, peek_cached_algorithms,
+                         get_strings_from_hash, get_strings_from_hashes, get_module_hashes, iter_module_hashes,
+                         hunt_hashes, get_hash_string_value, resolve_collision, is_sentinel_hash)
+from hashdb_core import config as core_config
+
 # These imports are specific to the Worker implementation
 import inspect
 import logging
+import queue
 import threading
 from threading import Thread
 from dataclasses import dataclass, field
@@ -199,7 +221,45 @@ NETNODE_NAME = "$hashdb"
 
 # Variables for async operations
 HASHDB_REQUEST_TIMEOUT = 15 # Limit to 15 seconds
-HASHDB_REQUEST_LOCK = threading.Lock()
+HASHDB_MAX_WORKERS = 4 # Maximum number of concurrent requests/jobs
+
+# Variables for bulk operations
+HASHDB_IMPORT_CHUNK_SIZE = 1000 # Module hashes added to the enum per main thread round trip
+
+# Variables for the shared HTTP session, the defaults are defined by hashdb_core
+HASHDB_POOL_CONNECTIONS = core_config.HASHDB_POOL_CONNECTIONS # Number of hosts to keep a connection pool for
+HASHDB_POOL_MAXSIZE = core_config.HASHDB_POOL_MAXSIZE # Maximum number of kept-alive connections per host
+
+# Variables for retrying transient API failures (see hashdb_core)
+HASHDB_RETRIES = core_config.HASHDB_RETRIES # Retries per request, with exponential backoff
+HASHDB_ERROR_BUDGET = core_config.HASHDB_ERROR_BUDGET # Failed requests tolerated per scan before giving up
+
+# Variables for the client side rate limiter (see hashdb_core)
+HASHDB_RATE_LIMIT = core_config.HASHDB_RATE_LIMIT # Requests per second, 0 is unlimited
+HASHDB_MAX_IN_FLIGHT = core_config.HASHDB_MAX_IN_FLIGHT # Concurrent requests, 0 is unlimited
+
+# Use the local result cache (see hashdb_core)
+HASHDB_USE_CACHE = True
+
+# Only use the local hashing engine, never contact the API
+HASHDB_OFFLINE = False
+
+# Convert resolved hash constants in the decompiler output automatically,
+#  off by default: decompiling a function would send its constants to the API
+HASHDB_DECOMPILER_ENUMS = False
+HASHDB_DECOMPILER_LOOKUPS = {} # (api url, algorithm, xor value, hash value) resolved or missed, oldest first
+HASHDB_DECOMPILER_LOOKUPS_MAX = 100000 # Remembered lookups, the oldest are forgotten first
+HASHDB_DECOMPILER_PENDING = set() # (api url, algorithm, xor value, hash value) being looked up
+HASHDB_DECOMPILER_LOCK = threading.Lock() # Guards the lookups and pending sets, workers update them
+
+# Modules which are downloaded in the background once an algorithm is selected
+HASHDB_PREFETCH_MODULES = ["kernel32", "ntdll", "advapi32", "user32", "ws2_32", "wininet", "shell32"]
+HASHDB_PREFETCHING = set() # (api url, module, algorithm, permutation) being prefetched
+
+# Variables for headless (batch) operation
+HASHDB_HEADLESS = False # Never show forms, names are sanitized automatically
+HASHDB_COLLISION_POLICY = "ask" # How collisions are resolved: ask, first, api or skip
+HASHDB_COLLISION_POLICIES = ["ask"] + COLLISION_POLICIES
 
 #--------------------------------------------------------------------------
 # Setup Icon
@@ -293,29 +353,35 @@ SCAN_ICON_DATA = b"".join([b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x10
                           b'\xcb\x80H\xa0J.\x00\xea\x17\x11t\xf2B5\x95\x00\x00\x00\x00IEND\xaeB`\x82'])
 SCAN_ICON = ida_kernwin.load_custom_icon(data=SCAN_ICON_DATA, format="png")
 
-#--------------------------------------------------------------------------
-# Error class
-#--------------------------------------------------------------------------
-class HashDBError(Exception):
-    pass
-
-
 #--------------------------------------------------------------------------
 # Worker implementation
 #--------------------------------------------------------------------------
-@dataclass(unsafe_hash=True)
-class Worker(Thread):
-    """The worker implementation for multi-threading support."""
+@dataclass(eq=False)
+class Worker:
+    """A job for the worker pool (`WorkerExecutor`)."""
     target: Callable
     args: tuple = field(default_factory=tuple, compare=False)
     done_callback: Callable = None
     error_callback: Callable = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, compare=False, repr=False)
 
-    def __post_init__(self):
-        """Required to initialize the base class (Thread)."""
-        super().__init__(target=self.__wrapped_target, args=self.args, daemon=True)
+    def start(self):
+        """Queue the job on the global worker pool."""
+        global HASHDB_EXECUTOR
+        HASHDB_EXECUTOR.submit(self)
 
-    def __wrapped_target(self, *args, **kwargs):
+    def cancel(self):
+        """
+        Request cancellation. Queued jobs are dropped, running targets are
+         expected to poll `is_cancelled` and return early.
+        """
+        self.cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def run(self):
         """
         Wraps the target function to allow callbacks and error handling.
         @raise Exception: if an unhandled exception is encountered it will
@@ -323,7 +389,7 @@ class Worker(Thread):
         """
         try:
             # Execute the target
-            results = self.target(*args, **kwargs)
+            results = self.target(*self.args)
 
             # Execute the done callback, if it exists
             if self.done_callback is not None:
@@ -353,93 +419,244 @@ class Worker(Thread):
                 raise exception
         finally:
             # Cleanup the callbacks (decrease reference counts)
-            if self.done_callback is not None:
-                del self.done_callback
-            if self.error_callback is not None:
-                del self.error_callback
+            self.done_callback = None
+            self.error_callback = None
+
+
+class WorkerExecutor:
+    """
+    Bounded thread pool for `Worker` jobs.
+
+    Jobs are queued and executed by at most `max_workers` threads, so
+     lookups, scans and hunts can run concurrently without blocking each other.
+    """
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.idle = 0
+        self.pending = set()
+        self.local = threading.local()
+
+    def submit(self, worker: Worker):
+        with self.lock:
+            self.pending.add(worker)
+            # Spawn a new thread if all of the current ones are busy,
+            #  otherwise the job waits in the queue
+            if self.idle <= self.jobs.qsize() and len(self.threads) < self.max_workers:
+                thread = Thread(target=self._thread_main, daemon=True)
+                self.threads.append(thread)
+                thread.start()
+        self.jobs.put(worker)
+
+    def current_worker(self) -> Union[None, Worker]:
+        """Returns the job executing on the calling thread (if any)."""
+        return getattr(self.local, "worker", None)
+
+    def cancel_all(self):
+        with self.lock:
+            for worker in self.pending:
+                worker.cancel()
+
+    def shutdown(self):
+        """Cancel all jobs and stop the threads."""
+        self.cancel_all()
+        with self.lock:
+            for _ in self.threads:
+                self.jobs.put(None)
+            self.threads = []
+
+    def _thread_main(self):
+        while True:
+            with self.lock:
+                self.idle += 1
+            worker = self.jobs.get()
+            with self.lock:
+                self.idle -= 1
+            if worker is None:
+                return
+
+            self.local.worker = worker
+            try:
+                if not worker.cancelled:
+                    worker.run()
+                else:
+                    logging.debug("Skipping cancelled job: {}".format(worker))
+            except Exception:
+                # Unhandled exceptions are reported by the global exception hook
+                sys.excepthook(*sys.exc_info())
+            finally:
+                self.local.worker = None
+                with self.lock:
+                    self.pending.discard(worker)
+
+
+def is_cancelled() -> bool:
+    """Returns True if the job running on the calling thread was cancelled."""
+    global HASHDB_EXECUTOR
+    worker = HASHDB_EXECUTOR.current_worker()
+    return worker is not None and worker.cancelled
+
+
+#--------------------------------------------------------------------------
+# Progress reporting
+#--------------------------------------------------------------------------
+class ProgressWaitBox:
+    """
+    IDA wait box for long running jobs, driven from the worker thread.
+
+    Shows per-item progress and an ETA, and cancels the job (`Worker.cancel`)
+     when the user presses the cancel button.
+    """
+    UPDATE_INTERVAL = 0.25 # Seconds between wait box updates
+
+    def __init__(self, title: str, total: int = 0, worker: Worker = None):
+        global HASHDB_EXECUTOR
+        self.title = title
+        self.total = total
+        self.worker = worker if worker is not None else HASHDB_EXECUTOR.current_worker()
+        self.start_time = time.time()
+        self.last_update = 0
+        self.cancelled = False
+
+    def __enter__(self):
+        self.show()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback_object):
+        self.hide()
+        return False
+
+    def _message(self, done: int) -> str:
+        message = "{}\n{}".format(self.title, done)
+        if self.total:
+            message += " / {} ({}%)".format(self.total, done * 100 // self.total)
+            elapsed = time.time() - self.start_time
+            if done and done < self.total:
+                message += ", about {} seconds left".format(int(elapsed / done * (self.total - done)) + 1)
+        return message
+
+    def show(self):
+        def show_wait_box() -> int:
+            ida_kernwin.show_wait_box(self._message(0))
+            return 0 # execute_sync dictates an int return value
+        ida_kernwin.execute_sync(show_wait_box, ida_kernwin.MFF_FAST)
+
+    def update(self, done: int, total: int = None) -> bool:
+        """
+        Update the progress. Returns False if the job was cancelled.
+        """
+        if total is not None:
+            self.total = total
+        if self.worker is not None and self.worker.cancelled:
+            self.cancelled = True
+        if self.cancelled:
+            return False
+
+        # Throttle the main thread round trips
+        now = time.time()
+        if now - self.last_update < self.UPDATE_INTERVAL and done != self.total:
+            return True
+        self.last_update = now
+
+        def update_wait_box() -> int:
+            ida_kernwin.replace_wait_box(self._message(done))
+            if ida_kernwin.user_cancelled():
+                self.cancelled = True
+            return 0 # execute_sync dictates an int return value
+        ida_kernwin.execute_sync(update_wait_box, ida_kernwin.MFF_FAST)
+
+        if self.cancelled and self.worker is not None:
+            self.worker.cancel()
+        return not self.cancelled
+
+    def hide(self):
+        def hide_wait_box() -> int:
+            ida_kernwin.hide_wait_box()
+            return 0 # execute_sync dictates an int return value
+        ida_kernwin.execute_sync(hide_wait_box, ida_kernwin.MFF_FAST)
+
 
-                
 #--------------------------------------------------------------------------
 # HashDB API 
 #--------------------------------------------------------------------------
+def configure_core():
+    """
+    Push the plugin settings to the core library (`hashdb_core`).
+    """
+    global HASHDB_API_URL, HASHDB_REQUEST_TIMEOUT, HASHDB_POOL_CONNECTIONS, \
+           HASHDB_POOL_MAXSIZE, HASHDB_RETRIES, HASHDB_ERROR_BUDGET, HASHDB_RATE_LIMIT, \
+           HASHDB_MAX_IN_FLIGHT, HASHDB_USE_CACHE, HASHDB_OFFLINE
+    hashdb_core.configure(api_url=HASHDB_API_URL,
+                          request_timeout=HASHDB_REQUEST_TIMEOUT,
+                          pool_connections=HASHDB_POOL_CONNECTIONS,
+                          pool_maxsize=HASHDB_POOL_MAXSIZE,
+                          retries=HASHDB_RETRIES,
+                          error_budget=HASHDB_ERROR_BUDGET,
+                          rate_limit=HASHDB_RATE_LIMIT,
+                          max_in_flight=HASHDB_MAX_IN_FLIGHT,
+                          use_cache=HASHDB_USE_CACHE,
+                          offline=HASHDB_OFFLINE,
+                          user_agent="HashDB-IDA/{}".format(VERSION),
+                          data_directory=os.path.join(ida_diskio.get_user_idadir(), "hashdb"))
+
+
+def report_unresolved(hash_results: dict, hash_values) -> int:
+    """
+    Let the user know about hashes which couldn't be resolved because
+     of API errors, returns their number.
+    """
+    unresolved = len(set(hash_values).difference(hash_results))
+    if unresolved:
+        idaapi.msg("WARNING: HashDB couldn't resolve {} hashes because of API errors, the results are partial.\n".format(unresolved))
+    return unresolved
 
-def get_algorithms(api_url='https://hashdb.openanalysis.net', timeout=None):
-    # Handle an empty timeout
-    global HASHDB_REQUEST_TIMEOUT
-    if timeout is None:
-        timeout = HASHDB_REQUEST_TIMEOUT
-
-    algorithms_url = api_url + '/hash'
-    r = requests.get(algorithms_url, timeout=timeout)
-    if not r.ok:
-        raise HashDBError("Get algorithms API request failed, status %s" % r.status_code)
-    results = r.json()
-
-    algorithms = []
-    for algorithm in results.get('algorithms',[]):
-        size = determine_algorithm_size(algorithm.get('type', None))
-        if size == 'Unknown':
-            idaapi.msg("ERROR: Unknown algorithm type encountered when fetching algorithms: %s" % size)
-        algorithms.append([algorithm.get('algorithm'), size])
-    return algorithms
-
-
-def get_strings_from_hash(algorithm, hash_value, xor_value=0, api_url='https://hashdb.openanalysis.net', timeout=None):
-    # Handle an empty timeout
-    global HASHDB_REQUEST_TIMEOUT
-    if timeout is None:
-        timeout = HASHDB_REQUEST_TIMEOUT
-
-    hash_value ^= xor_value
-    hash_url = api_url + '/hash/%s/%d' % (algorithm, hash_value)
-    r = requests.get(hash_url, timeout=timeout)
-    if not r.ok:
-        raise HashDBError("Get hash API request failed, status %s" % r.status_code)
-    results = r.json()
-    # Remove null bytes from non-api strings
-    hashes = results.get('hashes',[])
-    out_hashes = []
-    for hash_info in hashes:
-        if not hash_info.get('string',{}).get('is_api',True):
-            hash_info['string']['string'] = hash_info['string']['string'].replace('\x00','')
-        out_hashes.append(hash_info)
-    return {'hashes':out_hashes}
-
-
-def get_module_hashes(module_name, algorithm, permutation, api_url='https://hashdb.openanalysis.net', timeout=None):
-    # Handle an empty timeout
-    global HASHDB_REQUEST_TIMEOUT
-    if timeout is None:
-        timeout = HASHDB_REQUEST_TIMEOUT
-    
-    module_url = api_url + '/module/%s/%s/%s' % (module_name, algorithm, permutation)
-    r = requests.get(module_url, timeout=timeout)
-    if not r.ok:
-        raise HashDBError("Get hash API request failed, status %s" % r.status_code)
-    results = r.json()
-    return results
 
+def prefetch_module_hashes(algorithm: str, permutations: list = None, api_url: str = None):
+    """
+    Download the hashes of the most common modules (`HASHDB_PREFETCH_MODULES`)
+     into the local cache in the background, so bulk imports are instant.
 
-def hunt_hash(hash_value, api_url='https://hashdb.openanalysis.net', timeout = None):
-    # Handle an empty timeout
-    global HASHDB_REQUEST_TIMEOUT
-    if timeout is None:
-        timeout = HASHDB_REQUEST_TIMEOUT
-    
-    matches = []
-    hash_list = [hash_value]
-    module_url = api_url + '/hunt'
-    r = requests.post(module_url, json={"hashes": hash_list}, timeout=timeout)
-    if not r.ok:
-        print(module_url)
-        print(hash_list)
-        print(r.json())
-        raise HashDBError("Get hash API request failed, status %s" % r.status_code)
-    for hit in r.json().get('hits',[]):
-        algo = hit.get('algorithm',None)
-        if (algo != None) and (algo not in matches):
-            matches.append(algo)
-    return matches
+    If no permutations are provided, the permutations previously seen
+     for the algorithm are used.
+    """
+    global HASHDB_API_URL, HASHDB_OFFLINE, HASHDB_PREFETCH_MODULES, HASHDB_PREFETCHING
+    if api_url is None:
+        api_url = HASHDB_API_URL
+    cache = get_cache()
+    if cache is None or HASHDB_OFFLINE or not algorithm:
+        return
+    if permutations is None:
+        permutations = cache.get_permutations(api_url, algorithm)
+
+    # Only prefetch what isn't cached (or already being fetched)
+    jobs = []
+    for permutation in permutations:
+        for module_name in HASHDB_PREFETCH_MODULES:
+            key = (api_url, module_name, algorithm, permutation)
+            if key in HASHDB_PREFETCHING or cache.iter_module(*key) is not None:
+                continue
+            HASHDB_PREFETCHING.add(key)
+            jobs.append(key)
+    if not jobs:
+        return
+
+    def prefetch():
+        try:
+            for api_url, module_name, algorithm, permutation in jobs:
+                # Offline mode may have been enabled since the prefetch was queued
+                if is_cancelled() or HASHDB_OFFLINE:
+                    return
+                try:
+                    get_module_hashes(module_name, algorithm, permutation, api_url)
+                except (requests.RequestException, HashDBError) as exception:
+                    logging.debug("Prefetching module {} failed: {}".format(module_name, exception))
+        finally:
+            HASHDB_PREFETCHING.difference_update(jobs)
+
+    logging.debug("Prefetching {} module hash tables for {}".format(len(jobs), algorithm))
+    Worker(target=prefetch).start()
 
 
 #--------------------------------------------------------------------------
@@ -449,7 +666,12 @@ def load_settings():
     global HASHDB_API_URL 
     global HASHDB_USE_XOR, HASHDB_XOR_VALUE 
     global HASHDB_ALGORITHM, ENUM_PREFIX
+    global HASHDB_POOL_CONNECTIONS, HASHDB_POOL_MAXSIZE
+    global HASHDB_RETRIES, HASHDB_ERROR_BUDGET
+    global HASHDB_RATE_LIMIT, HASHDB_MAX_IN_FLIGHT
+    global HASHDB_USE_CACHE, HASHDB_OFFLINE, HASHDB_DECOMPILER_ENUMS
     global NETNODE_NAME
+    algorithm = None
     node = ida_netnode.netnode(NETNODE_NAME)
     if ida_netnode.exist(node):
         if bool(node.hashstr("HASHDB_API_URL")):
@@ -462,14 +684,38 @@ def load_settings():
         if bool(node.hashstr("HASHDB_XOR_VALUE")):
             HASHDB_XOR_VALUE = int(node.hashstr("HASHDB_XOR_VALUE"))
         if bool(node.hashstr("HASHDB_ALGORITHM")) and bool(node.hashstr("HASHDB_ALGORITHM_SIZE")):
-            successful = set_algorithm(node.hashstr("HASHDB_ALGORITHM"), node.hashstr("HASHDB_ALGORITHM_SIZE"))
-            if not successful:
-                idaapi.msg("HashDB failed to set the algorithm when parsing the saved config!\n")
+            algorithm = (node.hashstr("HASHDB_ALGORITHM"), node.hashstr("HASHDB_ALGORITHM_SIZE"))
         if bool(node.hashstr("ENUM_PREFIX")):
             ENUM_PREFIX = node.hashstr("ENUM_PREFIX")
+        if bool(node.hashstr("HASHDB_POOL_CONNECTIONS")):
+            HASHDB_POOL_CONNECTIONS = int(node.hashstr("HASHDB_POOL_CONNECTIONS"))
+        if bool(node.hashstr("HASHDB_POOL_MAXSIZE")):
+            HASHDB_POOL_MAXSIZE = int(node.hashstr("HASHDB_POOL_MAXSIZE"))
+        if bool(node.hashstr("HASHDB_RETRIES")):
+            HASHDB_RETRIES = int(node.hashstr("HASHDB_RETRIES"))
+        if bool(node.hashstr("HASHDB_ERROR_BUDGET")):
+            HASHDB_ERROR_BUDGET = int(node.hashstr("HASHDB_ERROR_BUDGET"))
+        if bool(node.hashstr("HASHDB_RATE_LIMIT")):
+            HASHDB_RATE_LIMIT = float(node.hashstr("HASHDB_RATE_LIMIT"))
+        if bool(node.hashstr("HASHDB_MAX_IN_FLIGHT")):
+            HASHDB_MAX_IN_FLIGHT = int(node.hashstr("HASHDB_MAX_IN_FLIGHT"))
+        if bool(node.hashstr("HASHDB_USE_CACHE")):
+            HASHDB_USE_CACHE = node.hashstr("HASHDB_USE_CACHE").lower() == "true"
+        if bool(node.hashstr("HASHDB_OFFLINE")):
+            HASHDB_OFFLINE = node.hashstr("HASHDB_OFFLINE").lower() == "true"
+        if bool(node.hashstr("HASHDB_DECOMPILER_ENUMS")):
+            HASHDB_DECOMPILER_ENUMS = node.hashstr("HASHDB_DECOMPILER_ENUMS").lower() == "true"
         idaapi.msg("HashDB configuration loaded!\n")
     else:
         idaapi.msg("No saved HashDB configuration\n")
+    configure_core()
+
+    # The algorithm is restored last, setting it reaches the core library
+    #  (module prefetch) which has to be configured first
+    if algorithm is not None:
+        successful = set_algorithm(*algorithm)
+        if not successful:
+            idaapi.msg("HashDB failed to set the algorithm when parsing the saved config!\n")
     return
 
 
@@ -477,6 +723,10 @@ def save_settings():
     global HASHDB_API_URL 
     global HASHDB_USE_XOR, HASHDB_XOR_VALUE 
     global HASHDB_ALGORITHM, ENUM_PREFIX
+    global HASHDB_POOL_CONNECTIONS, HASHDB_POOL_MAXSIZE
+    global HASHDB_RETRIES, HASHDB_ERROR_BUDGET
+    global HASHDB_RATE_LIMIT, HASHDB_MAX_IN_FLIGHT
+    global HASHDB_USE_CACHE, HASHDB_OFFLINE, HASHDB_DECOMPILER_ENUMS
     global NETNODE_NAME
 
     # Check if our netnode already exists, otherwise create a new one
@@ -499,6 +749,24 @@ def save_settings():
         node.hashset_buf("HASHDB_ALGORITHM_SIZE", str(HASHDB_ALGORITHM_SIZE))
     if ENUM_PREFIX != None:
         node.hashset_buf("ENUM_PREFIX", str(ENUM_PREFIX))
+    if HASHDB_POOL_CONNECTIONS != None:
+        node.hashset_buf("HASHDB_POOL_CONNECTIONS", str(HASHDB_POOL_CONNECTIONS))
+    if HASHDB_POOL_MAXSIZE != None:
+        node.hashset_buf("HASHDB_POOL_MAXSIZE", str(HASHDB_POOL_MAXSIZE))
+    if HASHDB_RETRIES != None:
+        node.hashset_buf("HASHDB_RETRIES", str(HASHDB_RETRIES))
+    if HASHDB_ERROR_BUDGET != None:
+        node.hashset_buf("HASHDB_ERROR_BUDGET", str(HASHDB_ERROR_BUDGET))
+    if HASHDB_RATE_LIMIT != None:
+        node.hashset_buf("HASHDB_RATE_LIMIT", str(HASHDB_RATE_LIMIT))
+    if HASHDB_MAX_IN_FLIGHT != None:
+        node.hashset_buf("HASHDB_MAX_IN_FLIGHT", str(HASHDB_MAX_IN_FLIGHT))
+    if HASHDB_USE_CACHE != None:
+        node.hashset_buf("HASHDB_USE_CACHE", str(HASHDB_USE_CACHE))
+    if HASHDB_OFFLINE != None:
+        node.hashset_buf("HASHDB_OFFLINE", str(HASHDB_OFFLINE))
+    if HASHDB_DECOMPILER_ENUMS != None:
+        node.hashset_buf("HASHDB_DECOMPILER_ENUMS", str(HASHDB_DECOMPILER_ENUMS))
     idaapi.msg("HashDB settings saved\n")
 
 
@@ -546,6 +814,11 @@ HashDB Settings
 <##API URL          :{iServer}>
 <##Enum Prefix      :{iEnum}>
 <Enable XOR:{rXor}>{cXorGroup}>  |  <##:{iXor}>(hex)
+<Cache lookup results:{rCache}>
+<Offline mode (local hashing only):{rOffline}>
+<Convert hashes in the decompiler:{rDecompiler}>{cOptionsGroup}>
+<##Rate limit       :{iRateLimit}>(requests/second, 0 = unlimited)
+<##Max in-flight    :{iMaxInFlight}>(concurrent requests, 0 = unlimited)
 <Select algorithm :{cAlgoChooser}><Refresh Algorithms:{iBtnRefresh}>
 
 """, {      'FormChangeCb': F.FormChangeCb(self.OnFormChange),
@@ -553,19 +826,29 @@ HashDB Settings
             'iEnum': F.StringInput(),
             'cXorGroup': F.ChkGroupControl(("rXor",)),
             'iXor': F.NumericInput(tp=F.FT_RAWHEX),
+            'cOptionsGroup': F.ChkGroupControl(("rCache", "rOffline", "rDecompiler")),
+            'iRateLimit': F.StringInput(), # Fractional rates are allowed, e.g. 0.5
+            'iMaxInFlight': F.NumericInput(tp=F.FT_DEC),
             'cAlgoChooser' : F.EmbeddedChooserControl(hashdb_settings_t.algorithm_chooser_t(algorithms)),
             'iBtnRefresh': F.ButtonInput(self.OnBtnRefresh),
         })
 
     def OnBtnRefresh(self, code=0):
+        global HASHDB_OFFLINE
         api_url = self.GetControlValue(self.iServer)
         algorithms = []
+        # Respect the (unsaved) offline checkbox
+        offline = HASHDB_OFFLINE
+        HASHDB_OFFLINE = bool(self.GetControlValue(self.cOptionsGroup) & 2)
+        configure_core()
         try:
             ida_kernwin.show_wait_box("HIDECANCEL\nPlease wait...")
-            algorithms = get_algorithms(api_url=api_url)
+            algorithms = get_cached_algorithms(api_url=api_url, refresh=True)
         except Exception as e:
             idaapi.msg("ERROR: HashDB API request failed: %s\n" % e)
         finally:
+            HASHDB_OFFLINE = offline
+            configure_core()
             ida_kernwin.hide_wait_box()
         # Sort the algorithms by algorithm name (lowercase)
         sorted_algorithms = sorted(algorithms, key = lambda algorithm: algorithm[0].lower())
@@ -597,11 +880,21 @@ HashDB Settings
              enum_prefix="hashdb_strings",
              use_xor=False,
              xor_value=0,
+             use_cache=True,
+             offline=False,
+             rate_limit=core_config.HASHDB_RATE_LIMIT,
+             max_in_flight=core_config.HASHDB_MAX_IN_FLIGHT,
+             decompiler_enums=False,
              algorithms=[]):
         global HASHDB_API_URL
         global HASHDB_USE_XOR
         global HASHDB_XOR_VALUE
         global HASHDB_ALGORITHM
+        global HASHDB_USE_CACHE
+        global HASHDB_OFFLINE
+        global HASHDB_RATE_LIMIT
+        global HASHDB_MAX_IN_FLIGHT
+        global HASHDB_DECOMPILER_ENUMS
         global ENUM_PREFIX
         # Sort the algorithms
         sorted_algorithms = sorted(algorithms, key = lambda algorithm: algorithm[0].lower())
@@ -615,6 +908,11 @@ HashDB Settings
         else:
             f.rXor.checked = False
         f.iXor.value = xor_value
+        f.rCache.checked = use_cache
+        f.rOffline.checked = offline
+        f.rDecompiler.checked = decompiler_enums
+        f.iRateLimit.value = "{:g}".format(rate_limit)
+        f.iMaxInFlight.value = max_in_flight
         # Show form
         ok = f.Execute()
         if ok == 1:
@@ -623,6 +921,15 @@ HashDB Settings
             HASHDB_XOR_VALUE = f.iXor.value
             HASHDB_API_URL = f.iServer.value
             ENUM_PREFIX = f.iEnum.value
+            HASHDB_USE_CACHE = f.rCache.checked
+            HASHDB_OFFLINE = f.rOffline.checked
+            HASHDB_DECOMPILER_ENUMS = f.rDecompiler.checked
+            try:
+                HASHDB_RATE_LIMIT = max(0.0, float(f.iRateLimit.value))
+            except ValueError:
+                idaapi.msg("HashDB: Invalid rate limit {}, keeping {:g} requests/second.\n".format(f.iRateLimit.value, HASHDB_RATE_LIMIT))
+            HASHDB_MAX_IN_FLIGHT = max(0, f.iMaxInFlight.value)
+            configure_core()
             # Check if algorithm is selected
             if f.cAlgoChooser.selection == None:
                 # No algorithm selected bail!
@@ -708,11 +1015,12 @@ class hunt_result_form_t(ida_kernwin.Form):
                 "",
                 [
                     ["Algorithm", 10],
-                    ["Size (Bits)", 5]
+                    ["Size (Bits)", 5],
+                    ["Hits", 5]
                 ],
                 flags=0,
                 embedded=True,
-                width=30,
+                width=36,
                 height=6)
             self.items = algo_list
             self.icon = None
@@ -747,17 +1055,20 @@ Matched Algorithms
                 self.ShowField(self.cAlgoChooser, False)
         return 1
 
-    def show(algo_list):
+    def show(algo_list, hash_count = 1):
         global HASHDB_API_URL
         global HASHDB_USE_XOR
         global HASHDB_XOR_VALUE
         global HASHDB_ALGORITHM
         # Set default values
         if len(algo_list) == 0:
-            msg = "No algorithms matched the hash."
+            msg = "No algorithms matched the hash." if hash_count == 1 else \
+                  "No algorithms matched any of the {} hashes.".format(hash_count)
             f = hunt_result_form_t(algo_list, msg)
         else:
-            msg = "The following algorithms contain a matching hash.\nSelect an algorithm to set as the default for HashDB."
+            msg = "The following algorithms contain a matching hash." if hash_count == 1 else \
+                  "The following algorithms match some of the {} hashes (ranked by hits).".format(hash_count)
+            msg += "\nSelect an algorithm to set as the default for HashDB."
             f = hunt_result_form_t(algo_list, msg)
         f, args = f.Compile()
         # Show form
@@ -913,6 +1224,20 @@ def get_invalid_characters(string: str) -> list:
     return invalid_characters
 
 
+def sanitize_name(string: str, invalid_characters: list = None) -> str:
+    """
+    Replace the invalid characters in a name with underscores,
+     names beginning with a digit are prefixed with an underscore.
+    """
+    if invalid_characters is None:
+        invalid_characters = get_invalid_characters(string)
+    sanitized = "".join('_' if index in invalid_characters and not (index == 0 and character.isdigit()) else character
+                        for index, character in enumerate(string))
+    if sanitized and sanitized[0].isdigit():
+        sanitized = '_' + sanitized
+    return sanitized
+
+
 def html_format_invalid_characters(string: str, invalid_characters: list, color: str = "#F44336") -> str:
     # Are there any invalid characters in the string?
     if not invalid_characters:
@@ -930,13 +1255,16 @@ def html_format_invalid_characters(string: str, invalid_characters: list, color:
     return formatted_string
 
 
-def add_enums(enum_name, hash_list, enum_size = 0):
+def add_enums(enum_name, hash_list, enum_size = 0, interactive = True):
     """
     Adds a hash list to an enum by name.
      IMPORTANT: This function should always be executed on the main thread.
 
     The hash list should be a list of tuples with three values:
      name: str, value: int, is_api: bool
+
+    If not `interactive` (or headless) invalid names are sanitized
+     instead of asking the user to correct them.
     """
     # Resolve the enum size
     if not enum_size:
@@ -961,9 +1289,13 @@ def add_enums(enum_name, hash_list, enum_size = 0):
     ENUM_MEMBER_ERROR_NAME    = 1 # a member with this name already exists
 
     MAXIMUM_ATTEMPTS = 256 # ENUM_MEMBER_ERROR_VALUE -> only allows 256 members with this value
+
+    # Index the existing members once, instead of querying IDA for every value and name
+    existing_values, existing_names = get_enum_members(enum_id)
+    next_indexes = {} # (member name, is_api) -> first index that may still be free
     for member_name, value, is_api in hash_list:
         # First, we have to check if this name and value already exist in the enum
-        if ida_enum.get_enum_member(enum_id, value, 0, 0) != idaapi.BADNODE:
+        if value in existing_values:
             continue # Skip if the value already exists in the enum
         
         # Replace spaces with underscores
@@ -975,6 +1307,9 @@ def add_enums(enum_name, hash_list, enum_size = 0):
         # Check if a member name is valid
         skip = False
         invalid_characters = get_invalid_characters(member_name)
+        if invalid_characters and (HASHDB_HEADLESS or not interactive):
+            member_name = sanitize_name(member_name, invalid_characters)
+            invalid_characters = get_invalid_characters(member_name)
         while invalid_characters:
             # Open the unqualified name form
             new_member_name = unqualified_name_replace_t.show(member_name, invalid_characters)
@@ -992,15 +1327,21 @@ def add_enums(enum_name, hash_list, enum_size = 0):
             continue
 
         # Attempt to generate a name, and insert the value
-        for index in range(MAXIMUM_ATTEMPTS):
+        for index in range(next_indexes.get((member_name, is_api), 0), MAXIMUM_ATTEMPTS):
             if is_api:
                 enum_name = member_name + '_' + str(index)
             else:
                 enum_name = member_name if not index else member_name + '_' + str(index - 1) # -1 to begin at 0 as opposed to `string_1`
+            if enum_name in existing_names:
+                continue
 
             result = ida_enum.add_enum_member(enum_id, enum_name, value)
+            # Names are global, the name is taken either way (by this member or another item)
+            existing_names.add(enum_name)
+            next_indexes[(member_name, is_api)] = index + 1
             # Successfully added to the list
             if result == ENUM_MEMBER_ERROR_SUCCESS:
+                existing_values.add(value)
                 break
 
             # Unhandled error (TODO: add logging)
@@ -1009,6 +1350,97 @@ def add_enums(enum_name, hash_list, enum_size = 0):
     return enum_id
 
 
+def get_enum_members(enum_id) -> tuple:
+    """
+    Returns the sets of values and names of all members in an enum.
+    """
+    values = set()
+    names = set()
+    value = ida_enum.get_first_enum_member(enum_id, ida_enum.DEFMASK)
+    while value != idaapi.BADADDR:
+        values.add(value)
+        member_id, serial = ida_enum.get_first_serial_enum_member(enum_id, value, ida_enum.DEFMASK)
+        while member_id != idaapi.BADNODE:
+            names.add(ida_enum.get_enum_member_name(member_id))
+            member_id, serial = ida_enum.get_next_serial_enum_member(serial, member_id)
+        value = ida_enum.get_next_enum_member(enum_id, value, ida_enum.DEFMASK)
+    return values, names
+
+
+def select_hash_string(hashes: list, interactive: bool = True) -> Union[None, dict]:
+    """
+    Returns the string object of a lookup result, collisions are resolved
+     according to `HASHDB_COLLISION_POLICY`; by default the user is asked to
+     select the correct string (collisions are skipped if not `interactive`).
+     IMPORTANT: This function should always be executed on the main thread.
+    """
+    global HASHDB_COLLISION_POLICY, HASHDB_HEADLESS
+    if not hashes:
+        return None
+    if len(hashes) == 1:
+        return hashes[0].get("string", {})
+
+    # Resolve collisions without prompting the user
+    if HASHDB_COLLISION_POLICY != "ask":
+        return resolve_collision(hashes, HASHDB_COLLISION_POLICY)
+    if HASHDB_HEADLESS or not interactive:
+        return resolve_collision(hashes, "skip")
+
+    collisions = {}
+    for entry in hashes:
+        string_object = entry.get("string", {})
+        if string_object.get("is_api", False):
+            collisions[string_object.get("api", "")] = string_object
+        else:
+            collisions[string_object.get("string", "")] = string_object
+    selected_string = match_select_t.show([*collisions.keys()])
+    if selected_string is None:
+        return None
+    return collisions[selected_string]
+
+
+def add_resolved_hashes(hash_results: dict, interactive: bool = True) -> tuple:
+    """
+    Select the strings of resolved hashes and add them all to the hash enum at once.
+     IMPORTANT: This function should always be executed on the main thread.
+
+    `hash_results` maps hash values to their lookup results. Returns the
+     enum id (None on failure) and a dictionary mapping the added hash values
+     to their (name, string object).
+    """
+    global ENUM_PREFIX
+    resolved = {}
+    for hash_value, hashes in hash_results.items():
+        string_object = select_hash_string(hashes, interactive)
+        if string_object is None:
+            continue
+        resolved[hash_value] = (get_hash_string_value(string_object), string_object)
+    if not resolved:
+        return None, resolved
+
+    enum_list = [(name, hash_value, string_object.get("is_api", False))
+                 for hash_value, (name, string_object) in resolved.items()]
+    enum_id = add_enums(generate_enum_name(ENUM_PREFIX), enum_list, interactive=interactive)
+    if enum_id is None:
+        idaapi.msg("ERROR: Unable to create or find enum: {}\n".format(generate_enum_name(ENUM_PREFIX)))
+    return enum_id, resolved
+
+
+def set_unique_name(ea: int, name: str):
+    """
+    Name an address, a numeric suffix is appended if the name already exists.
+    """
+    if not name: # is the name empty?
+        return
+
+    index = 1
+    suffix = ""
+    while idc.get_name_ea_simple(name + suffix) != idaapi.BADADDR:
+        suffix = "_{}".format(index)
+        index += 1
+    idc.set_name(ea, name + suffix, idc.SN_CHECK)
+
+
 def generate_enum_name(prefix: str) -> str:
     """
     Generates an enum name from a prefix
@@ -1124,6 +1556,74 @@ def read_integer_from_db(ea: int, default_size: int = 0) -> int:
     raise HashDBError("Failed to read integer from database at location: {} with size {}.".format(hex(ea), default_size))
 
 
+# struct format characters of the integer sizes
+INTEGER_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+
+
+def get_data_element_size(flags: int) -> int:
+    '''Returns the element size of an integer data item (or array), 0 for other items.'''
+    if ida_bytes.is_qword(flags):
+        return 8
+    if ida_bytes.is_dword(flags):
+        return 4
+    if ida_bytes.is_word(flags):
+        return 2
+    if ida_bytes.is_byte(flags):
+        return 1
+    return 0
+
+
+def read_integers_from_db(start: int, end: int, default_size: int = 0) -> Union[None, list]:
+    '''
+    Read all integers in a range with a single `get_bytes` call, the sizes
+     match stepping through the range with `read_integer_from_db`.
+     Undefined runs and integer data items are decoded at once, the type
+     of other items is guessed individually.
+
+    The type of arrays can't be guessed (`idc_guess_type` returns `int[N]`),
+     so like undefined bytes they're read with the default size (or byte by
+     byte) unless their element size is the default size.
+    Returns: [[ea, value, size], ...] or None if the range can't be read
+    '''
+    if end <= start:
+        return []
+    data = ida_bytes.get_bytes(start, end - start)
+    if data is None or len(data) != end - start:
+        return None
+    byte_order = ">" if ida_ida.inf_is_be() else "<"
+
+    integers = []
+    ea = start
+    while ea < end:
+        flags = ida_bytes.get_flags(ea)
+        size = 0
+        run_end = ea
+        if ida_bytes.is_unknown(flags):
+            # Undefined bytes up to the next item
+            run_end = ida_bytes.next_head(ea, end)
+            if run_end == idaapi.BADADDR:
+                run_end = end
+            size = default_size or 1
+        elif ida_bytes.is_data(flags):
+            item_end = ida_bytes.get_item_end(ea)
+            run_end = min(item_end, end)
+            size = get_data_element_size(flags)
+            if size and item_end - ea > size and size != default_size:
+                size = default_size or 1
+
+        count = (run_end - ea) // size if size else 0
+        if count:
+            values = struct.unpack_from("{}{}{}".format(byte_order, count, INTEGER_FORMATS[size]), data, ea - start)
+            integers.extend([ea + index * size, value, size] for index, value in enumerate(values))
+            ea += count * size
+        else:
+            # Other items (and values crossing an item boundary) are read individually
+            [value, size, _] = read_integer_from_db(ea, default_size)
+            integers.append([ea, value, size])
+            ea += size
+    return integers
+
+
 def convert_data_to_integer(ea, size: int = 0) -> int:
     '''
     Converts the data into a QWORD, DWORD, WORD, or BYTE based on the size provided
@@ -1152,14 +1652,19 @@ def global_settings():
     global HASHDB_XOR_VALUE
     global HASHDB_ALGORITHM
     global ENUM_PREFIX
-    if HASHDB_ALGORITHM != None:
-        algorithms = [[HASHDB_ALGORITHM, str(HASHDB_ALGORITHM_SIZE)]]
-    else:
-        algorithms = []
+    # Show the cached catalog, it is refreshed on demand
+    algorithms = [] if HASHDB_OFFLINE else list(peek_cached_algorithms(HASHDB_API_URL))
+    if HASHDB_ALGORITHM != None and HASHDB_ALGORITHM not in [algorithm[0] for algorithm in algorithms]:
+        algorithms.append([HASHDB_ALGORITHM, str(HASHDB_ALGORITHM_SIZE)])
     settings_results = hashdb_settings_t.show(api_url=HASHDB_API_URL, 
                                               enum_prefix=ENUM_PREFIX,
                                               use_xor=HASHDB_USE_XOR,
                                               xor_value=HASHDB_XOR_VALUE,
+                                              use_cache=HASHDB_USE_CACHE,
+                                              offline=HASHDB_OFFLINE,
+                                              rate_limit=HASHDB_RATE_LIMIT,
+                                              max_in_flight=HASHDB_MAX_IN_FLIGHT,
+                                              decompiler_enums=HASHDB_DECOMPILER_ENUMS,
                                               algorithms=algorithms)
     if settings_results:
         idaapi.msg("HashDB configured successfully!\nHASHDB_API_URL: %s\nHASHDB_USE_XOR: %s\nHASHDB_XOR_VALUE: %s\nHASHDB_ALGORITHM: %s\nHASHDB_ALGORITHM_SIZE: %s\n" % 
@@ -1169,6 +1674,38 @@ def global_settings():
     return 
 
 
+def ensure_algorithm_selected() -> bool:
+    """
+    If an algorithm isn't selected, give the user a chance to choose one.
+     Returns False if the user cancelled the settings form.
+    """
+    global HASHDB_ALGORITHM, HASHDB_ALGORITHM_SIZE, HASHDB_API_URL, \
+           ENUM_PREFIX, HASHDB_USE_XOR, HASHDB_XOR_VALUE
+    if HASHDB_ALGORITHM is not None:
+        return True
+
+    idaapi.warning("Please select a hash algorithm before using HashDB.")
+    settings_results = hashdb_settings_t.show(api_url=HASHDB_API_URL, 
+                                              enum_prefix=ENUM_PREFIX,
+                                              use_xor=HASHDB_USE_XOR,
+                                              xor_value=HASHDB_XOR_VALUE,
+                                              use_cache=HASHDB_USE_CACHE,
+                                              offline=HASHDB_OFFLINE,
+                                              rate_limit=HASHDB_RATE_LIMIT,
+                                              max_in_flight=HASHDB_MAX_IN_FLIGHT,
+                                              decompiler_enums=HASHDB_DECOMPILER_ENUMS)
+    if settings_results:
+        idaapi.msg("HashDB configured successfully!\n" +
+                   "HASHDB_API_URL:        {}\n".format(HASHDB_API_URL) +
+                   "HASHDB_USE_XOR:        {}\n".format(HASHDB_USE_XOR) +
+                   "HASHDB_XOR_VALUE:      {}\n".format(hex(HASHDB_XOR_VALUE)) +
+                   "HASHDB_ALGORITHM:      {}\n".format(HASHDB_ALGORITHM) +
+                   "HASHDB_ALGORITHM_SIZE: {}\n".format(HASHDB_ALGORITHM_SIZE))
+        return True
+    idaapi.msg("HashDB configuration cancelled!\n")
+    return False
+
+
 #--------------------------------------------------------------------------
 # Set the algorithm and its size
 #--------------------------------------------------------------------------
@@ -1181,7 +1718,7 @@ def set_algorithm(algorithm: str, size: int) -> bool:
         idaapi.msg("HashDB encountered an error while trying to set the algorithm: provided algorithm is a string type: %s\n", algorithm)
         return False
     
-    if isinstance(size, str):
+    if isinstance(size, str) and size.isdigit():
         size = int(size)
     if not isinstance(size, int):
         idaapi.msg("HashDB encountered an error while trying to set the algorithm: provided size is not an integer: %s\n" % size)
@@ -1196,19 +1733,11 @@ def set_algorithm(algorithm: str, size: int) -> bool:
     # Set the algorithm and size
     HASHDB_ALGORITHM = algorithm
     HASHDB_ALGORITHM_SIZE = size
-    return True
 
-
-def determine_algorithm_size(algorithm_type: str) -> str:
-    size = 'Unknown'
-    if algorithm_type is None:
-        return size
-    
-    if algorithm_type == 'unsigned_int':
-        size = '32'
-    elif algorithm_type == 'unsigned_long':
-        size = '64'
-    return size
+    # Warm up the module cache for bulk imports (batch jobs don't import modules)
+    if not HASHDB_HEADLESS:
+        prefetch_module_hashes(algorithm)
+    return True
 
 
 #--------------------------------------------------------------------------
@@ -1230,6 +1759,86 @@ def set_xor_key():
     HASHDB_USE_XOR = True
     idaapi.msg("XOR key set: {}\n".format(hex(xor_value)))
     return True
+
+
+def solve_xor_done(solutions: Union[None, list] = None, hash_count: int = 0):
+    logging.debug("solve_xor_done callback invoked, result: {}".format("none" if solutions is None else "{}".format(solutions)))
+
+    # Check if the `solve_xor_request` function was cancelled
+    if solutions is None:
+        return
+    if not solutions:
+        idaapi.msg("HashDB: Couldn't derive an xor key from {} hash candidates.\n".format(hash_count))
+        return
+    for algorithm, xor_value, hits in solutions:
+        idaapi.msg("HashDB: XOR key {} ({}) maps {} of {} hash candidates.\n".format(hex(xor_value), algorithm, hits, hash_count))
+
+    # Propose the best key
+    def propose_xor_key() -> int:
+        global HASHDB_USE_XOR, HASHDB_XOR_VALUE, HASHDB_ALGORITHM
+        algorithm, xor_value, hits = solutions[0]
+        question = "HashDB found the XOR key {} ({}), it maps {} of the {} hash candidates.\nSet it as the XOR key?".format(
+            hex(xor_value), algorithm, hits, hash_count)
+        if xor_value == 0:
+            question = "HashDB found that the hashes ({}) aren't xored, {} of the {} hash candidates match.\nDisable the XOR key?".format(
+                algorithm, hits, hash_count)
+        if ida_kernwin.ask_yn(ida_kernwin.ASKBTN_YES, question) != ida_kernwin.ASKBTN_YES:
+            return 0 # execute_sync dictates an int return value
+        if algorithm != HASHDB_ALGORITHM:
+            set_algorithm(algorithm, LOCAL_ALGORITHMS[algorithm][1])
+            idaapi.msg("HashDB: Set algorithm to: {}\n".format(algorithm))
+        HASHDB_XOR_VALUE = xor_value
+        HASHDB_USE_XOR = xor_value != 0
+        idaapi.msg("XOR key set: {}\n".format(hex(xor_value)))
+        return 0 # execute_sync dictates an int return value
+
+    ida_kernwin.execute_sync(propose_xor_key, ida_kernwin.MFF_FAST)
+
+
+def solve_xor_error(exception: Exception):
+    exception_string = traceback.format_exc()
+    logging.critical("solve_xor_request errored: {}".format(exception_string))
+    idaapi.msg("ERROR: HashDB xor key solver failed: {}\n".format(exception_string))
+
+
+def solve_xor_request(hash_values: list, algorithm: Union[None, str]) -> tuple:
+    """
+    Solve the xor key with the local hashing engine, and provide the
+     solutions to the `solve_xor_done` callback.
+    """
+    with ProgressWaitBox("HashDB: Solving the XOR key...") as progress:
+        solutions = solve_xor_key(hash_values, algorithm, progress_callback=progress.update)
+    if progress.cancelled:
+        idaapi.msg("HashDB: XOR key solver cancelled.\n")
+        return None, len(hash_values)
+    return solutions, len(hash_values)
+
+
+def solve_xor():
+    """
+    Derive the xor key from the candidate hash values of the highlighted
+     range or current function, using the local hashing engine.
+
+    The candidates are collected here, the (CPU bound) solver runs on the worker pool.
+    """
+    global HASHDB_ALGORITHM
+    hash_values = collect_hunt_values(use_highlight=False)
+    if hash_values is None:
+        idaapi.msg("HashDB ERROR: Select a range or place the cursor inside a function to solve the xor key.\n")
+        return False
+    if len(hash_values) < 3:
+        idaapi.msg("HashDB: At least 3 hash candidates are required to solve the xor key, found {}.\n".format(len(hash_values)))
+        return False
+
+    # Use the selected algorithm if it's implemented locally, else try them all
+    algorithm = HASHDB_ALGORITHM if HASHDB_ALGORITHM in LOCAL_ALGORITHMS else None
+    if HASHDB_ALGORITHM is not None and algorithm is None:
+        idaapi.msg("HashDB: {} isn't implemented locally, trying all local algorithms.\n".format(HASHDB_ALGORITHM))
+
+    worker = Worker(target=solve_xor_request, args=(hash_values, algorithm),
+                    done_callback=solve_xor_done, error_callback=solve_xor_error)
+    worker.start()
+    return True
     
 
 #--------------------------------------------------------------------------
@@ -1297,11 +1906,13 @@ def hash_lookup_done_handler(hash_list: Union[None, list], hash_value: int = Non
         return
     
     # If the hash was pulled from the disassembly window
-    # make the constant an enum 
-    # TODO: I don't know how to do this in the decompiler window
+    # make the constant an enum, in the decompiler window
+    # the constants are converted when the view is refreshed
     def make_const_enum_wrapper(enum_id, hash_value):
         if ida_kernwin.get_viewer_place_type(ida_kernwin.get_current_viewer()) == ida_kernwin.TCCPT_IDAPLACE:
             make_const_enum(enum_id, hash_value)
+        else:
+            refresh_pseudocode()
         return 0 # execute_sync dictates an int return value
     
     make_const_enum_wrapper_callable = functools.partial(make_const_enum_wrapper, enum_id, hash_value)
@@ -1323,50 +1934,67 @@ def hash_lookup_done_handler(hash_list: Union[None, list], hash_value: int = Non
     if module_name is None:
         return
 
-    # Import all of the hashes from the module and permutation
-    module_hash_list = None
+    # Remember the permutation, and fetch the other common modules while we're at it
+    global HASHDB_ALGORITHM, HASHDB_API_URL, HASHDB_REQUEST_TIMEOUT
+    cache = get_cache()
+    if cache is not None:
+        cache.add_permutation(HASHDB_API_URL, HASHDB_ALGORITHM, hash_string.get("permutation", ""))
+    prefetch_module_hashes(HASHDB_ALGORITHM, [hash_string.get("permutation", "")])
+
+    # Import all of the hashes from the module and permutation, the hashes
+    #  are streamed and added to the global enum in chunks
+    global HASHDB_USE_XOR, HASHDB_XOR_VALUE, HASHDB_IMPORT_CHUNK_SIZE
+    def add_chunk(enum_list: list) -> bool:
+        nonlocal enum_id
+        enum_id = None
+        add_enums_callable = functools.partial(add_enums_wrapper, generate_enum_name(ENUM_PREFIX), enum_list)
+        ida_kernwin.execute_sync(add_enums_callable, ida_kernwin.MFF_FAST)
+        if enum_id is None:
+            idaapi.msg("ERROR: Unable to create or find enum: {}\n".format(generate_enum_name(ENUM_PREFIX)))
+            return False
+        return True
+
+    hash_count = 0
+    enum_list = []
     try:
-        global HASHDB_ALGORITHM, HASHDB_API_URL, HASHDB_REQUEST_TIMEOUT
-        module_hash_list = get_module_hashes(module_name, HASHDB_ALGORITHM, hash_string.get("permutation", ""), HASHDB_API_URL, timeout=HASHDB_REQUEST_TIMEOUT)
+        with ProgressWaitBox("HashDB: Importing hashes for module {}...".format(module_name)) as progress:
+            for hash_entry in iter_module_hashes(module_name, HASHDB_ALGORITHM, hash_string.get("permutation", ""), HASHDB_API_URL, timeout=HASHDB_REQUEST_TIMEOUT):
+                hash = hash_entry.get("hash", 0)
+                string_object = hash_entry.get("string", {})
+                enum_list.append((string_object.get("api", string_object.get("string", "")), # name
+                                 hash ^ HASHDB_XOR_VALUE if HASHDB_USE_XOR else hash, # hash_value
+                                 True)) # is_api
+                # Stops the download (and closes the response) when cancelled
+                if not progress.update(hash_count + len(enum_list)):
+                    idaapi.msg("HashDB: Import cancelled after {} hashes.\n".format(hash_count))
+                    return
+                if len(enum_list) >= HASHDB_IMPORT_CHUNK_SIZE:
+                    if not add_chunk(enum_list):
+                        return
+                    hash_count += len(enum_list)
+                    enum_list = []
+                    idaapi.msg("HashDB: Imported {} hashes for module {}...\n".format(hash_count, module_name))
     except requests.Timeout:
         idaapi.msg("ERROR: HashDB API module hashes request timed out.\n")
         logging.exception("API request to {} timed out.".format(HASHDB_API_URL))
         return
 
-    # Add the hash list to the global enum
-    global HASHDB_USE_XOR, HASHDB_XOR_VALUE
-    enum_list = []
-    for hash_entry in module_hash_list.get("hashes", []):
-        hash = hash_entry.get("hash", 0)
-        string_object = hash_entry.get("string", {})
-        enum_list.append((string_object.get("api", string_object.get("string", "")), # name
-                         hash ^ HASHDB_XOR_VALUE if HASHDB_USE_XOR else hash, # hash_value
-                         True)) # is_api
-    
-    # Add hashes to enum
-    enum_id = None
-    add_enums_callable = functools.partial(add_enums_wrapper, generate_enum_name(ENUM_PREFIX), enum_list)
-    ida_kernwin.execute_sync(add_enums_callable, ida_kernwin.MFF_FAST)
-    if enum_id is None:
-        idaapi.msg("ERROR: Unable to create or find enum: {}\n".format(generate_enum_name(ENUM_PREFIX)))
-    else:
-        idaapi.msg("HashDB: Added {} hashes for module {}\n".format(len(enum_list), module_name))
+    # Add the remaining hashes to the enum
+    if enum_list or not hash_count:
+        if not add_chunk(enum_list):
+            return
+        hash_count += len(enum_list)
+    idaapi.msg("HashDB: Added {} hashes for module {}\n".format(hash_count, module_name))
 
 
 def hash_lookup_done(hash_list: Union[None, list] = None, hash_value: int = None):
-    global HASHDB_REQUEST_LOCK
     hash_lookup_done_handler(hash_list, hash_value)
 
-    # Release the lock
-    HASHDB_REQUEST_LOCK.release()
-
 
 def hash_lookup_error(exception: Exception):
-    global HASHDB_REQUEST_LOCK
     exception_string = traceback.format_exc()
     logging.critical("hash_lookup_request errored: {}".format(exception_string))
     idaapi.msg("ERROR: HashDB hash scan failed: {}\n".format(exception_string))
-    HASHDB_REQUEST_LOCK.release()
 
 
 def hash_lookup_request(api_url: str, algorithm: str,
@@ -1389,32 +2017,18 @@ def hash_lookup_request(api_url: str, algorithm: str,
     return hash_list, hash_value
 
 
-def hash_lookup_run(timeout: Union[int, float] = 0) -> bool:
+def hash_lookup_run(timeout: Union[int, float] = 0) -> Union[None, Worker]:
     # Check if an algorithm is selected
     global HASHDB_ALGORITHM, HASHDB_ALGORITHM_SIZE, HASHDB_API_URL, \
            ENUM_PREFIX, HASHDB_USE_XOR, HASHDB_XOR_VALUE
-    if HASHDB_ALGORITHM is None:
-        idaapi.warning("Please select a hash algorithm before using HashDB.")
-        settings_results = hashdb_settings_t.show(api_url=HASHDB_API_URL, 
-                                                  enum_prefix=ENUM_PREFIX,
-                                                  use_xor=HASHDB_USE_XOR,
-                                                  xor_value=HASHDB_XOR_VALUE)
-        if settings_results:
-            idaapi.msg("HashDB configured successfully!\n" +
-                       "HASHDB_API_URL:        {}\n".format(HASHDB_API_URL) +
-                       "HASHDB_USE_XOR:        {}\n".format(HASHDB_USE_XOR) +
-                       "HASHDB_XOR_VALUE:      {}\n".format(hex(HASHDB_XOR_VALUE)) +
-                       "HASHDB_ALGORITHM:      {}\n".format(HASHDB_ALGORITHM) +
-                       "HASHDB_ALGORITHM_SIZE: {}\n".format(HASHDB_ALGORITHM_SIZE))
-        else:
-            idaapi.msg("HashDB configuration cancelled!\n")
-            return True # Release the lock
+    if not ensure_algorithm_selected():
+        return None
     
     # Get the selected hash value
     hash_value = parse_highlighted_value()
     if hash_value is None:
         idaapi.msg("HashDB ERROR: Invalid hash value selection.\n")
-        return True # Release the lock
+        return None
     else:
         idaapi.msg("HashDB: Found hash value: {}\n".format(hex(hash_value)))
 
@@ -1423,31 +2037,20 @@ def hash_lookup_run(timeout: Union[int, float] = 0) -> bool:
         HASHDB_API_URL, HASHDB_ALGORITHM, hash_value, HASHDB_XOR_VALUE if HASHDB_USE_XOR else None, timeout),
         done_callback=hash_lookup_done, error_callback=hash_lookup_error)
     worker.start()
-    return False # Do not release the lock
+    return worker
 
 
 def hash_lookup():
     """
     Lookup a hash value from the highlighted text.
 
-    The function will spawn a new thread with a timeout (`HASHDB_REQUEST_TIMEOUT`).
-     While executing, the request lock is acquired.
+    The request is executed on the worker pool with a timeout (`HASHDB_REQUEST_TIMEOUT`),
+     other requests can run concurrently.
     """
-    # Check if we're already running a request
-    global HASHDB_REQUEST_LOCK, HASHDB_REQUEST_TIMEOUT
+    global HASHDB_REQUEST_TIMEOUT
     timeout_string = "{}".format(HASHDB_REQUEST_TIMEOUT) + " second{}".format('s' if HASHDB_REQUEST_TIMEOUT != 1 else "")
-    if HASHDB_REQUEST_LOCK.locked():
-        logging.debug("An async operation was requested, but the response lock was locked. Aborting.")
-        ida_kernwin.info("Please wait until the previous request is finished.\n" +
-                         "Requests timeout after {}.".format(timeout_string))
-        return
-
-    # Acquire the lock and execute the request
-    HASHDB_REQUEST_LOCK.acquire()
     idaapi.msg("HashDB: Searching for a hash, please wait! Timeout: {}.\n".format(timeout_string))
-    release_lock = hash_lookup_run(timeout=HASHDB_REQUEST_TIMEOUT)
-    if release_lock:
-        HASHDB_REQUEST_LOCK.release()
+    hash_lookup_run(timeout=HASHDB_REQUEST_TIMEOUT)
 
 
 #--------------------------------------------------------------------------
@@ -1455,143 +2058,82 @@ def hash_lookup():
 # TODO: convert_values should be fetched from the UI (add a checkbox)
 #--------------------------------------------------------------------------
 def hash_scan_done(convert_values: bool = False, hash_list: Union[None, list] = None):
-    global HASHDB_REQUEST_LOCK
     logging.debug("hash_scan_done callback invoked, result: {}".format("none" if hash_list is None else "{}".format(hash_list)))
 
-    global ENUM_PREFIX
-    def add_enums_wrapper(enum_name: str, hash_list):
-        nonlocal enum_id
-        enum_id = add_enums(enum_name, hash_list)
-        return 0 # execute_sync dictates an int return value
-    
     # Check if the `hash_scan_request` function failed (a caught exception should return `None`)
-    if hash_list is not None:
-        for hash_entry in hash_list:
-            hashes = hash_entry["hashes"]
-            hash_string_object = {}
+    if hash_list is None:
+        return
+
+    for hash_entry in hash_list:
+        if not hash_entry["hashes"]:
+            idaapi.msg("HashDB: Couldn't find any matches for hash value {} ({} bytes) at {}\n".format(hex(hash_entry["hash_value"]), hash_entry["size"], hex(hash_entry["ea"])))
+
+    # Apply the whole result set in a single main thread round trip
+    def apply_results() -> int:
+        enum_id, resolved = add_resolved_hashes({hash_entry["hash_value"]: hash_entry["hashes"]
+                                                 for hash_entry in hash_list if hash_entry["hashes"]})
+        if enum_id is None or not convert_values:
+            return 0 # execute_sync dictates an int return value
 
-            entries_count = len(hashes)
-            if not entries_count:
-                idaapi.msg("HashDB: Couldn't find any matches for hash value {} ({} bytes) at {}\n".format(hex(hash_entry["hash_value"]), hash_entry["size"], hex(hash_entry["ea"])))
+        NUMBER_OF_OPERANDS = 0
+        SERIAL = 0
+        for hash_entry in hash_list:
+            if hash_entry["hash_value"] not in resolved:
                 continue
+            name, _ = resolved[hash_entry["hash_value"]]
+            # Convert to integer (this step is required due to an IDA api bug - `ida_bytes.op_enum` will set the wrong size)
+            convert_data_to_integer(hash_entry["ea"], hash_entry["size"])
+            # Convert to enum
+            ida_bytes.op_enum(hash_entry["ea"], NUMBER_OF_OPERANDS, enum_id, SERIAL)
+            # Add a label
+            set_unique_name(hash_entry["ea"], "ptr_" + name)
+        return 0 # execute_sync dictates an int return value
 
-            # Resolve the hash string object from the response
-            if entries_count == 1:
-                hash_string_object = hashes[0].get("string", {})
-            else:
-                # Check for collisions
-                collisions = {}
-                for entry in hashes:
-                    string_object = entry.get("string", {})
-                    if string_object.get("is_api", False):
-                        collisions[string_object.get("api", "")] = string_object
-                    else:
-                        collisions[string_object.get("string", "")] = string_object
-                
-                # Execute the match_select_t form on the main thread
-                def match_select_show(collision_strings):
-                    nonlocal selected_string
-                    selected_string = match_select_t.show(collision_strings)
-                    return 0 # execute_sync dictates an int return value
-
-                selected_string = None
-                match_select_callable = functools.partial(match_select_show, [*collisions.keys()])
-                ida_kernwin.execute_sync(match_select_callable, ida_kernwin.MFF_FAST)
-                if selected_string is None:
-                    HASHDB_REQUEST_LOCK.release() # Release the lock
-                    return
-                
-                hash_string_object = collisions[selected_string]
-            
-            # Parse the string from hash_string_object
-            hash_string_value = ""
-            if hash_string_object.get("is_api", False):
-                hash_string_value = hash_string_object.get("api", "")
-            else:
-                hash_string_value = hash_string_object.get("string", "")
-            
-            # Handle empty string values
-            if not len(hash_string_value):
-                hash_string_value = "empty_string"
-            
-            # Add hash to enum
-            enum_id = None
-            add_enums_callable = functools.partial(add_enums_wrapper, generate_enum_name(ENUM_PREFIX), [(hash_string_value, hash_entry["hash_value"], hash_string_object.get("is_api", False))])
-            ida_kernwin.execute_sync(add_enums_callable, ida_kernwin.MFF_FAST)
-            if enum_id is None:
-                idaapi.msg("ERROR: Unable to create or find enum: {}\n".format(generate_enum_name(ENUM_PREFIX)))
-                HASHDB_REQUEST_LOCK.release() # Release the lock
-                return
-            
-            # Should we convert the values in the database?
-            if convert_values:
-                # Convert to integer (this step is required due to an IDA api bug - `ida_bytes.op_enum` will set the wrong size)
-                def convert_to_integer(ea: int, size: int):
-                    convert_data_to_integer(ea, size)
-
-                convert_to_integer_callable = functools.partial(convert_to_integer, hash_entry["ea"], hash_entry["size"])
-                ida_kernwin.execute_sync(convert_to_integer_callable, ida_kernwin.MFF_FAST)
-
-                # Convert to enum
-                def convert_to_enum(ea: int, enum_id: int):
-                    NUMBER_OF_OPERANDS = 0
-                    SERIAL = 0
-                    ida_bytes.op_enum(ea, NUMBER_OF_OPERANDS, enum_id, SERIAL)
-                    return 0 # execute_sync dictates an int return value
-                
-                convert_to_enum_callable = functools.partial(convert_to_enum, hash_entry["ea"], enum_id)
-                ida_kernwin.execute_sync(convert_to_enum_callable, ida_kernwin.MFF_FAST)
-
-                # Add a label
-                def set_name(ea: int, name: str):
-                    if not name: # is the name empty?
-                        return 0 # execute_sync dictates an int return value
-                    
-                    # Does the name already exist? If so, modify it!
-                    index = 1
-                    suffix = ""
-                    while idc.get_name_ea_simple(name + suffix) != idaapi.BADADDR:
-                        suffix = "_{}".format(index)
-                        index += 1
-
-                    idc.set_name(ea, name + suffix, idc.SN_CHECK)
-                    return 0 # execute_sync dictates an int return value
-                
-                set_name_callable = functools.partial(set_name, hash_entry["ea"], "ptr_" + hash_string_value)
-                ida_kernwin.execute_sync(set_name_callable, ida_kernwin.MFF_FAST)
-    
-    # Release the lock
-    HASHDB_REQUEST_LOCK.release()
+    ida_kernwin.execute_sync(apply_results, ida_kernwin.MFF_WRITE)
 
 
 def hash_scan_error(exception: Exception):
-    global HASHDB_REQUEST_LOCK
     exception_string = traceback.format_exc()
     logging.critical("hash_scan_request errored: {}".format(exception_string))
     idaapi.msg("ERROR: HashDB hash scan failed: {}\n".format(exception_string))
-    HASHDB_REQUEST_LOCK.release()
 
 
 def hash_scan_request(convert_values: bool, hash_list: list,
                             api_url: str, algorithm: str, xor_value: int,
                             timeout: Union[int, float]) -> Union[None, list]:
-    for hash_entry in hash_list:
-        try:
-            hash_results = get_strings_from_hash(algorithm, hash_entry["hash_value"], xor_value if xor_value is not None else 0, api_url, timeout)
-        except requests.Timeout:
-            idaapi.msg("ERROR: HashDB API lookup scan request timed out.\n")
-            logging.exception("API request to {} timed out:".format(HASHDB_API_URL))
+    # Resolve every distinct hash value once, the results are fanned out to all entries below
+    hash_values = list(dict.fromkeys(hash_entry["hash_value"] for hash_entry in hash_list))
+    if len(hash_values) < len(hash_list):
+        idaapi.msg("HashDB: Resolving {} unique hash values for {} entries.\n".format(len(hash_values), len(hash_list)))
+    try:
+        with ProgressWaitBox("HashDB: Resolving scanned hashes...", len(hash_values)) as progress:
+            hash_results = get_strings_from_hashes(algorithm, hash_values,
+                                                   xor_value if xor_value is not None else 0, api_url, timeout,
+                                                   progress_callback=progress.update)
+    except requests.Timeout:
+        idaapi.msg("ERROR: HashDB API lookup scan request timed out.\n")
+        logging.exception("API request to {} timed out:".format(HASHDB_API_URL))
+        return None, None
+    if progress.cancelled:
+        # Apply what was resolved before the cancel, the rest is left untouched
+        skipped = len(set(hash_values).difference(hash_results))
+        idaapi.msg("HashDB: Scan cancelled, {} of {} hash values were not looked up.\n".format(skipped, len(hash_values)))
+        hash_list = [hash_entry for hash_entry in hash_list if hash_entry["hash_value"] in hash_results]
+        if not hash_list:
             return None, None
-        
-        hash_entry["hashes"] = hash_results.get("hashes", [])
+    else:
+        report_unresolved(hash_results, hash_values)
+
+    for hash_entry in hash_list:
+        hash_entry["hashes"] = hash_results.get(hash_entry["hash_value"], [])
     return convert_values, hash_list
 
 
-def hash_scan_run(convert_values: bool, timeout: Union[int, float] = 0) -> bool:
+def hash_scan_run(convert_values: bool, timeout: Union[int, float] = 0) -> Union[None, Worker]:
     # Only scan for data in the dissassembler
     if ida_kernwin.get_viewer_place_type(ida_kernwin.get_current_viewer()) != ida_kernwin.TCCPT_IDAPLACE:
         idaapi.msg("ERROR: Scan only available in dissassembler.\n")
-        return True # Release the lock
+        return None
     
     # Get the highlighted range
     start = idc.read_selection_start()
@@ -1604,27 +2146,13 @@ def hash_scan_run(convert_values: bool, timeout: Union[int, float] = 0) -> bool:
     # If an algorithm isn't selected, give the user a chance to choose one
     global HASHDB_ALGORITHM, HASHDB_ALGORITHM_SIZE, HASHDB_API_URL, \
            ENUM_PREFIX, HASHDB_USE_XOR, HASHDB_XOR_VALUE
-    if HASHDB_ALGORITHM is None:
-        idaapi.warning("Please select a hash algorithm before using HashDB.")
-        settings_results = hashdb_settings_t.show(api_url=HASHDB_API_URL, 
-                                                  enum_prefix=ENUM_PREFIX,
-                                                  use_xor=HASHDB_USE_XOR,
-                                                  xor_value=HASHDB_XOR_VALUE)
-        if settings_results:
-            idaapi.msg("HashDB configured successfully!\n" +
-                       "HASHDB_API_URL:        {}\n".format(HASHDB_API_URL) +
-                       "HASHDB_USE_XOR:        {}\n".format(HASHDB_USE_XOR) +
-                       "HASHDB_XOR_VALUE:      {}\n".format(hex(HASHDB_XOR_VALUE)) +
-                       "HASHDB_ALGORITHM:      {}\n".format(HASHDB_ALGORITHM) +
-                       "HASHDB_ALGORITHM_SIZE: {}\n".format(HASHDB_ALGORITHM_SIZE))
-        else:
-            idaapi.msg("HashDB configuration cancelled!\n")
-            return True # Release the lock
+    if not ensure_algorithm_selected():
+        return None
     
     # Check for a valid algorithm size
     if not HASHDB_ALGORITHM_SIZE == 32 and not HASHDB_ALGORITHM_SIZE == 64:
         idaapi.msg("ERROR: Unexpected algorithm size provided: {}\n".format(HASHDB_ALGORITHM_SIZE))
-        return True # Release the lock
+        return None
     
     # Look through the selected range and lookup each (valid) entry
     def scan_range(start: int, end: int) -> list:
@@ -1635,25 +2163,35 @@ def hash_scan_run(convert_values: bool, timeout: Union[int, float] = 0) -> bool:
         Undefined types will be interpreted appropriately.
          As a result, the user is required to define the types if they
          expect valid results.
+
+        Padding and sentinel values (see `is_sentinel_hash`) are skipped.
         """
-        hash_values = []
-        ea = start
-        while ea < end:
-            # Read the hash value and determine the step size:
-            [hash_value, step_size, was_type_valid] = read_integer_from_db(ea)
-            # If the type wasn't valid (undefined), convert it in the database
-            #   and modify the hash value and step size accordingly:
-            if convert_values and not was_type_valid:
-                [hash_value, step_size, was_type_valid] = read_integer_from_db(ea, HASHDB_ALGORITHM_SIZE // 8)
-
-            # Insert the hash value into the list
-            hash_values.append({"ea": ea, "hash_value": hash_value, "size": step_size})
-
-            # Next hash
-            ea += step_size
-        return hash_values
+        # Undefined values are read with the algorithm size if they will be converted
+        integers = read_integers_from_db(start, end, HASHDB_ALGORITHM_SIZE // 8 if convert_values else 0)
+        if integers is None:
+            # The range can't be read at once (e.g. it spans unloaded bytes), read it item by item
+            integers = []
+            ea = start
+            while ea < end:
+                # Read the hash value and determine the step size:
+                [hash_value, step_size, was_type_valid] = read_integer_from_db(ea)
+                # If the type wasn't valid (undefined), convert it in the database
+                #   and modify the hash value and step size accordingly:
+                if convert_values and not was_type_valid:
+                    [hash_value, step_size, was_type_valid] = read_integer_from_db(ea, HASHDB_ALGORITHM_SIZE // 8)
+                integers.append([ea, hash_value, step_size])
+
+                # Next hash
+                ea += step_size
+
+        # Insert the hash values into the list (unless they're padding)
+        return [{"ea": ea, "hash_value": hash_value, "size": size}
+                for ea, hash_value, size in integers if not is_sentinel_hash(hash_value, size * 8)]
     
     hash_list = scan_range(start, end)
+    if not hash_list:
+        idaapi.msg("HashDB: No hash values found in the selected range.\n")
+        return None
     for index, hash_entry in enumerate(hash_list, start=1):
         idaapi.msg("HashDB: [{}] Found hash value {} ({} bytes) at {}\n".format(index, hex(hash_entry["hash_value"]), hash_entry["size"], hex(hash_entry["ea"])))
     
@@ -1664,145 +2202,500 @@ def hash_scan_run(convert_values: bool, timeout: Union[int, float] = 0) -> bool:
                                                     timeout),
                                                     done_callback=hash_scan_done, error_callback=hash_scan_error)
     worker.start()
-    return False # Do not release the lock
+    return worker
 
 
 def hash_scan(convert_values = True):
     """
     Scan for a dynamic hash table.
 
-    The function will spawn a new thread with a timeout (`HASHDB_REQUEST_TIMEOUT`).
-     While executing, the request lock is acquired.
+    The request is executed on the worker pool with a timeout (`HASHDB_REQUEST_TIMEOUT`),
+     other requests can run concurrently.
     """
-    # Check if we're already running a request
-    global HASHDB_REQUEST_LOCK, HASHDB_REQUEST_TIMEOUT
+    global HASHDB_REQUEST_TIMEOUT
     timeout_string = "{}".format(HASHDB_REQUEST_TIMEOUT) + " second{}".format('s' if HASHDB_REQUEST_TIMEOUT != 1 else "")
-    if HASHDB_REQUEST_LOCK.locked():
-        logging.debug("An async operation was requested, but the response lock was locked. Aborting.")
-        ida_kernwin.info("Please wait until the previous request is finished.\n" +
-                         "Requests timeout after {}.".format(timeout_string))
+    idaapi.msg("HashDB: Scanning for hashes, please wait! Timeout: {}.\n".format(timeout_string))
+    hash_scan_run(convert_values=convert_values, timeout=HASHDB_REQUEST_TIMEOUT)
+
+
+#--------------------------------------------------------------------------
+# Whole database hash sweep
+#--------------------------------------------------------------------------
+def is_candidate_hash(value: int, size: int) -> bool:
+    """
+    Heuristically decide if a constant could be a hash of `size` bits:
+     small integers (and small negatives), low entropy values and
+     addresses inside the database are rejected.
+    """
+    mask = (1 << size) - 1
+    if value <= 0xFFFF or value >= mask - 0xFFFF or value > mask:
+        return False
+
+    # Hashes have roughly half of their bits set
+    bit_count = bin(value).count("1")
+    if bit_count < size // 8 or bit_count > size - size // 8:
+        return False
+
+    # Repeated bytes (e.g. 0x41414141) are rarely hashes
+    if len(set(value.to_bytes(size // 8, "little"))) < size // 16:
+        return False
+
+    # Pointers into the database
+    if ida_bytes.is_mapped(value):
+        return False
+    return True
+
+
+def collect_hash_candidates(size: int, start: int = None, end: int = None,
+                            progress_callback: Callable = None) -> Union[None, dict]:
+    """
+    Collect candidate hash constants from instruction operands and data items.
+     IMPORTANT: This function should always be executed on the main thread.
+
+    The optional `progress_callback(ea, ranges)` is invoked at the start of every
+     range (segment) and periodically within it; if it returns False the
+     collection is aborted and None is returned.
+
+    Returns a dictionary mapping each (unique) value to a list of
+     locations, a location is an (ea, operand number) tuple.
+    """
+    mask = (1 << size) - 1
+    byte_size = size // 8
+    candidates = {}
+
+    def add_candidate(value: int, ea: int, operand: int):
+        # Truncate sign extended immediates (e.g. push imm32 on x64)
+        if value > mask and (value >> size) in (0, (1 << (64 - size)) - 1):
+            value &= mask
+        if is_candidate_hash(value, size):
+            candidates.setdefault(value, []).append((ea, operand))
+
+    ranges = [(start, end)] if start is not None else \
+             [(segment, idc.get_segm_end(segment)) for segment in idautils.Segments()]
+    PROGRESS_INTERVAL = 0x100 # Heads between progress callbacks
+    insn = ida_ua.insn_t()
+    head_count = 0
+    for range_start, range_end in ranges:
+        if progress_callback is not None and progress_callback(range_start, ranges) is False:
+            return None
+        for ea in idautils.Heads(range_start, range_end):
+            head_count += 1
+            if progress_callback is not None and head_count % PROGRESS_INTERVAL == 0:
+                if progress_callback(ea, ranges) is False:
+                    return None
+            flags = ida_bytes.get_flags(ea)
+            if ida_bytes.is_code(flags):
+                if not ida_ua.decode_insn(insn, ea):
+                    continue
+                for operand in insn.ops:
+                    if operand.type == ida_ua.o_void:
+                        break
+                    # Skip operands which are already converted to an enum
+                    if operand.type == ida_ua.o_imm and not ida_bytes.is_enum(flags, operand.n):
+                        add_candidate(operand.value, ea, operand.n)
+            elif ida_bytes.is_data(flags) and not ida_bytes.is_enum(flags, 0):
+                if byte_size == 4 and ida_bytes.is_dword(flags):
+                    read_value = ida_bytes.get_32bit
+                elif byte_size == 8 and ida_bytes.is_qword(flags):
+                    read_value = ida_bytes.get_64bit
+                else:
+                    continue
+                # Arrays are converted as a whole, so every element shares the head location
+                item_end = ida_bytes.get_item_end(ea)
+                for element in range(ea, item_end, byte_size):
+                    add_candidate(read_value(element), ea, 0)
+    return candidates
+
+
+def hash_sweep_done(candidates: Union[None, dict] = None, hash_results: Union[None, dict] = None):
+    logging.debug("hash_sweep_done callback invoked, results: {}".format("none" if hash_results is None else len(hash_results)))
+    if candidates is None or hash_results is None:
         return
 
-    # Acquire the lock and execute the request
-    HASHDB_REQUEST_LOCK.acquire()
-    idaapi.msg("HashDB: Scanning for hashes, please wait! Timeout: {}.\n".format(timeout_string))
-    release_lock = hash_scan_run(convert_values=convert_values, timeout=HASHDB_REQUEST_TIMEOUT)
-    if release_lock:
-        HASHDB_REQUEST_LOCK.release()
+    # Select the strings, add them to the enum and convert all operands in one go
+    def apply_results() -> int:
+        enum_id, resolved = add_resolved_hashes(hash_results)
+        if not resolved:
+            idaapi.msg("HashDB: Couldn't resolve any of the {} candidate hashes.\n".format(len(candidates)))
+            return 0
+        if enum_id is None:
+            return 0
+
+        SERIAL = 0
+        location_count = 0
+        for hash_value, (name, _) in resolved.items():
+            for ea, operand in candidates[hash_value]:
+                ida_bytes.op_enum(ea, operand, enum_id, SERIAL)
+                location_count += 1
+            idaapi.msg("HashDB: Resolved {} to {} ({} locations)\n".format(hex(hash_value), name, len(candidates[hash_value])))
+        idaapi.msg("HashDB: Sweep resolved {} hashes at {} locations.\n".format(len(resolved), location_count))
+        return 0 # execute_sync dictates an int return value
+
+    ida_kernwin.execute_sync(apply_results, ida_kernwin.MFF_WRITE)
+
+
+def hash_sweep_error(exception: Exception):
+    exception_string = traceback.format_exc()
+    logging.critical("hash_sweep_request errored: {}".format(exception_string))
+    idaapi.msg("ERROR: HashDB hash sweep failed: {}\n".format(exception_string))
+
+
+def hash_sweep_request(candidates: dict, api_url: str, algorithm: str,
+                       xor_value: Union[None, int], timeout: Union[int, float]) -> tuple:
+    # Resolve all unique candidates at once
+    try:
+        with ProgressWaitBox("HashDB: Resolving hash candidates...", len(candidates)) as progress:
+            hash_results = get_strings_from_hashes(algorithm, list(candidates.keys()),
+                                                   xor_value if xor_value is not None else 0, api_url, timeout,
+                                                   progress_callback=progress.update)
+    except requests.Timeout:
+        idaapi.msg("ERROR: HashDB API sweep request timed out.\n")
+        logging.exception("API request to {} timed out:".format(api_url))
+        return None, None
+    if progress.cancelled:
+        idaapi.msg("HashDB: Sweep cancelled.\n")
+        return None, None
+    report_unresolved(hash_results, candidates.keys())
+
+    # Only keep the resolved hashes
+    return candidates, {hash_value: hashes for hash_value, hashes in hash_results.items() if hashes}
+
+
+def hash_sweep_run(timeout: Union[int, float] = 0) -> Union[None, Worker]:
+    global HASHDB_ALGORITHM, HASHDB_ALGORITHM_SIZE, HASHDB_API_URL, \
+           HASHDB_USE_XOR, HASHDB_XOR_VALUE
+    if not ensure_algorithm_selected():
+        return None
+
+    # Check for a valid algorithm size
+    if not HASHDB_ALGORITHM_SIZE == 32 and not HASHDB_ALGORITHM_SIZE == 64:
+        idaapi.msg("ERROR: Unexpected algorithm size provided: {}\n".format(HASHDB_ALGORITHM_SIZE))
+        return None
+
+    # Collect the candidates from the whole database, segment by segment
+    last_update = 0
+    def collection_progress(ea: int, ranges: list) -> bool:
+        nonlocal last_update
+        if ida_kernwin.user_cancelled():
+            return False
+        # Throttle the wait box updates, the cancel button is checked every time
+        if time.time() - last_update < ProgressWaitBox.UPDATE_INTERVAL:
+            return True
+        last_update = time.time()
+        total = sum(range_end - range_start for range_start, range_end in ranges)
+        done = sum(min(max(ea - range_start, 0), range_end - range_start) for range_start, range_end in ranges)
+        ida_kernwin.replace_wait_box("HashDB: Collecting hash candidates in {}... {}%".format(
+            idc.get_segm_name(ea), done * 100 // total if total else 100))
+        return True
+
+    ida_kernwin.show_wait_box("HashDB: Collecting hash candidates...")
+    try:
+        candidates = collect_hash_candidates(HASHDB_ALGORITHM_SIZE, progress_callback=collection_progress)
+    finally:
+        ida_kernwin.hide_wait_box()
+    if candidates is None:
+        idaapi.msg("HashDB: Sweep cancelled.\n")
+        return None
+    if not candidates:
+        idaapi.msg("HashDB: No hash candidates found.\n")
+        return None
+    idaapi.msg("HashDB: Found {} unique hash candidates at {} locations.\n".format(
+        len(candidates), sum(len(locations) for locations in candidates.values())))
+
+    # Resolve all candidates, and provide the `hash_sweep_done` callback with the results
+    worker = Worker(target=hash_sweep_request, args=(candidates, HASHDB_API_URL, HASHDB_ALGORITHM,
+                                                     HASHDB_XOR_VALUE if HASHDB_USE_XOR else None,
+                                                     timeout),
+                    done_callback=hash_sweep_done, error_callback=hash_sweep_error)
+    worker.start()
+    return worker
+
+
+def hash_sweep():
+    """
+    Scan all instructions and data items in the database for hash constants,
+     resolve them in bulk and convert the resolved constants to enums.
+
+    The request is executed on the worker pool with a timeout (`HASHDB_REQUEST_TIMEOUT`),
+     other requests can run concurrently.
+    """
+    global HASHDB_REQUEST_TIMEOUT
+    timeout_string = "{}".format(HASHDB_REQUEST_TIMEOUT) + " second{}".format('s' if HASHDB_REQUEST_TIMEOUT != 1 else "")
+    idaapi.msg("HashDB: Scanning the database for hashes, please wait! Timeout: {}.\n".format(timeout_string))
+    hash_sweep_run(timeout=HASHDB_REQUEST_TIMEOUT)
+
+
+#--------------------------------------------------------------------------
+# Decompiler hash constants
+#--------------------------------------------------------------------------
+class hash_constant_visitor_t(ida_hexrays.ctree_visitor_t):
+    """
+    Collects the numeric constants of a ctree which could be hashes of `size` bits.
+    """
+    def __init__(self, size: int):
+        ida_hexrays.ctree_visitor_t.__init__(self, ida_hexrays.CV_FAST)
+        self.size = size
+        self.constants = {} # value -> [cexpr_t]
+
+    def visit_expr(self, expression) -> int:
+        if expression.op == ida_hexrays.cot_num:
+            mask = (1 << self.size) - 1
+            value = expression.n._value
+            # Truncate sign extended constants
+            if value > mask and (value >> self.size) in (0, (1 << (64 - self.size)) - 1):
+                value &= mask
+            if is_candidate_hash(value, self.size):
+                self.constants.setdefault(value, []).append(expression)
+        return 0
+
+
+def refresh_pseudocode(function_ea: int = None):
+    """
+    Refresh the current pseudocode view (if it shows `function_ea`).
+     IMPORTANT: This function should always be executed on the main thread.
+    """
+    vu = ida_hexrays.get_widget_vdui(ida_kernwin.get_current_widget())
+    if vu is None or vu.cfunc is None:
+        return
+    if function_ea is None or vu.cfunc.entry_ea == function_ea:
+        vu.refresh_view(True)
+
+
+def convert_decompiler_hashes(cfunc):
+    """
+    Show the hash constants of a decompiled function as hash enum members.
+     Constants which are already in the enum are converted right away, the
+     others are resolved in the background and the view is refreshed.
+     IMPORTANT: This function should always be executed on the main thread.
+    """
+    global HASHDB_DECOMPILER_ENUMS, HASHDB_DECOMPILER_LOOKUPS, HASHDB_DECOMPILER_PENDING, \
+           HASHDB_DECOMPILER_LOCK, HASHDB_ALGORITHM, HASHDB_ALGORITHM_SIZE, HASHDB_API_URL, HASHDB_USE_XOR, HASHDB_XOR_VALUE, \
+           HASHDB_REQUEST_TIMEOUT, ENUM_PREFIX
+    if not HASHDB_DECOMPILER_ENUMS or HASHDB_ALGORITHM is None or HASHDB_ALGORITHM_SIZE not in (32, 64):
+        return
+
+    visitor = hash_constant_visitor_t(HASHDB_ALGORITHM_SIZE)
+    visitor.apply_to(cfunc.body, None)
+    if not visitor.constants:
+        return
+
+    enum_name = generate_enum_name(ENUM_PREFIX)
+    enum_id = ida_enum.get_enum(enum_name)
+    SERIAL = 0
+    xor_value = HASHDB_XOR_VALUE if HASHDB_USE_XOR else 0
+    hash_values = []
+    for value, expressions in visitor.constants.items():
+        if enum_id != idaapi.BADNODE and \
+           ida_enum.get_enum_member(enum_id, value, SERIAL, ida_enum.DEFMASK) != idaapi.BADNODE:
+            for expression in expressions:
+                expression.n.nf.flags = ida_bytes.enum_flag()
+                expression.n.nf.serial = SERIAL
+                expression.n.nf.type_name = enum_name
+            continue
+        # Constants are only looked up again if the lookup failed, unresolved constants are common
+        lookup = (HASHDB_API_URL, HASHDB_ALGORITHM, xor_value, value)
+        with HASHDB_DECOMPILER_LOCK:
+            if lookup in HASHDB_DECOMPILER_LOOKUPS or lookup in HASHDB_DECOMPILER_PENDING:
+                continue
+            HASHDB_DECOMPILER_PENDING.add(lookup)
+        hash_values.append(value)
+    if not hash_values:
+        return
+
+    # Resolve the new constants, and provide the `decompiler_hashes_done` callback with the results
+    worker = Worker(target=decompiler_hashes_request, args=(cfunc.entry_ea, hash_values, HASHDB_API_URL,
+                                                            HASHDB_ALGORITHM, xor_value, HASHDB_REQUEST_TIMEOUT),
+                    done_callback=decompiler_hashes_done, error_callback=decompiler_hashes_error)
+    worker.start()
+
+
+def decompiler_hashes_request(function_ea: int, hash_values: list, api_url: str, algorithm: str,
+                              xor_value: int, timeout: Union[int, float]) -> tuple:
+    global HASHDB_DECOMPILER_LOOKUPS, HASHDB_DECOMPILER_LOOKUPS_MAX, HASHDB_DECOMPILER_PENDING, HASHDB_DECOMPILER_LOCK
+    # Resolve all constants at once (served from the cache and local engine if possible)
+    hash_results = {}
+    try:
+        hash_results = get_strings_from_hashes(algorithm, hash_values, xor_value, api_url, timeout)
+    except requests.Timeout:
+        logging.exception("API request to {} timed out:".format(api_url))
+        return None, None
+    finally:
+        # Remember the resolved and missed constants, failed lookups (missing
+        #  from the results) are retried the next time the function is decompiled
+        with HASHDB_DECOMPILER_LOCK:
+            for hash_value in hash_values:
+                lookup = (api_url, algorithm, xor_value, hash_value)
+                if hash_value in hash_results:
+                    HASHDB_DECOMPILER_LOOKUPS[lookup] = True
+                HASHDB_DECOMPILER_PENDING.discard(lookup)
+            while len(HASHDB_DECOMPILER_LOOKUPS) > HASHDB_DECOMPILER_LOOKUPS_MAX:
+                HASHDB_DECOMPILER_LOOKUPS.pop(next(iter(HASHDB_DECOMPILER_LOOKUPS)))
+
+    # Only keep the resolved hashes
+    return function_ea, {hash_value: hashes for hash_value, hashes in hash_results.items() if hashes}
+
+
+def decompiler_hashes_done(function_ea: Union[None, int] = None, hash_results: Union[None, dict] = None):
+    logging.debug("decompiler_hashes_done callback invoked, results: {}".format("none" if hash_results is None else len(hash_results)))
+    if function_ea is None or not hash_results:
+        return
+
+    # Add the hashes to the enum (without prompting the user), the constants
+    #  are converted once the function is decompiled again
+    def apply_results() -> int:
+        _, resolved = add_resolved_hashes(hash_results, interactive=False)
+        if not resolved:
+            return 0
+        for hash_value, (name, _) in resolved.items():
+            idaapi.msg("HashDB: Resolved {} to {} in {}\n".format(hex(hash_value), name, hex(function_ea)))
+        ida_hexrays.mark_cfunc_dirty(function_ea)
+        refresh_pseudocode(function_ea)
+        return 0 # execute_sync dictates an int return value
+
+    ida_kernwin.execute_sync(apply_results, ida_kernwin.MFF_WRITE)
+
+
+def decompiler_hashes_error(exception: Exception):
+    exception_string = traceback.format_exc()
+    logging.critical("decompiler_hashes_request errored: {}".format(exception_string))
+    idaapi.msg("ERROR: HashDB decompiler lookup failed: {}\n".format(exception_string))
 
 
 #--------------------------------------------------------------------------
 # Algorithm search function
 #--------------------------------------------------------------------------
-def hunt_algorithm_done(response: Union[None, list] = None):
-    global HASHDB_REQUEST_LOCK
+def hunt_algorithm_done(response: Union[None, list] = None, hash_count: int = 1):
     logging.debug("hunt_algorithm_done callback invoked, result: {}".format("none" if response is None else "{}".format(response)))
 
     # Display the result
     if response is not None:
         logging.debug("Displaying hash_result_form_t.")
-        hunt_result_form_callable = functools.partial(hunt_result_form_t.show, response)
+        hunt_result_form_callable = functools.partial(hunt_result_form_t.show, response, hash_count)
         ida_kernwin.execute_sync(hunt_result_form_callable, ida_kernwin.MFF_FAST)
     else:
         logging.debug("Couldn't find any algorithms that match the provided hash.")
         idaapi.msg("HashDB: Couldn't find any algorithms that match the provided hash.")
-    
-    # Release the lock
-    HASHDB_REQUEST_LOCK.release()
 
 
 def hunt_algorithm_error(exception: Exception):
-    global HASHDB_REQUEST_LOCK
     exception_string = traceback.format_exc()
     logging.critical("hunt_algorithm_request errored: {}".format(exception_string))
     idaapi.msg("ERROR: HashDB hash scan failed: {}\n".format(exception_string))
-    HASHDB_REQUEST_LOCK.release()
 
 
-def hunt_algorithm_request(hash_value: int, timeout=None) -> Union[None, list]:
+def hunt_algorithm_request(hash_values: list, timeout=None, xor_value: int = 0) -> tuple:
     """
     Perform the actual request, and provide the results to the
      `hunt_algorithm_done` callback.
+
+    All hash values are hunted at once, the algorithms are ranked by
+     the number of hash values they produce.
     
     This function is required to be a coroutine for seamless timeout handling.
     """
-    global HASHDB_REQUEST_LOCK, HASHDB_API_URL
+    global HASHDB_API_URL, HASHDB_OFFLINE
+
+    # The local engine knows the algorithm sizes, the API is always asked as
+    #  well (unless offline) since it knows far more algorithms
+    hits = dict(hunt_local_hashes(hash_values, xor_value))
+    sizes = {algorithm: str(LOCAL_ALGORITHMS[algorithm][1]) for algorithm in hits}
+    if not HASHDB_OFFLINE:
+        # Attempt to find matches
+        match_results = None
+        try:
+            # Send a single hunt request for all hash values
+            match_results = hunt_hashes([hash_value ^ xor_value for hash_value in hash_values],
+                                        api_url=HASHDB_API_URL, timeout=timeout)
+        except (requests.exceptions.Timeout, requests.exceptions.ReadTimeout):
+            idaapi.msg("ERROR: HashDB API hunt hash request timed out.\n")
+            logging.exception("API request to {} timed out.".format(HASHDB_API_URL))
+            return None, len(hash_values)
+
+        # Fix the results (algorithm sizes), the hunt_result_form_t form
+        #  expects the algorithm name and size
+        algorithm_sizes = {}
+        try:
+            # Usually served from the algorithm catalog cache, refreshed once
+            #  if the API matched an algorithm the cached catalog doesn't know
+            algorithm_sizes = dict(get_cached_algorithms(api_url=HASHDB_API_URL, timeout=timeout))
+            if any(match not in algorithm_sizes and match not in sizes for match, _ in match_results):
+                algorithm_sizes = dict(get_cached_algorithms(api_url=HASHDB_API_URL, timeout=timeout, refresh=True))
+        except (requests.exceptions.Timeout, requests.exceptions.ReadTimeout):
+            idaapi.msg("ERROR: HashDB API algorithms request timed out.\n")
+            logging.exception("API request to {} timed out.".format(HASHDB_API_URL))
+            return None, len(hash_values)
+        for match, match_hits in match_results:
+            hits[match] = max(hits.get(match, 0), match_hits)
+            sizes.setdefault(match, algorithm_sizes.get(match, "Unknown"))
+
+    # Return the results, best match first
+    ranked = sorted(hits.items(), key=lambda match: (-match[1], match[0]))
+    return [[algorithm, sizes[algorithm], str(algorithm_hits)] for algorithm, algorithm_hits in ranked], len(hash_values)
+
+
+def collect_hunt_values(use_highlight: bool = True) -> Union[None, list]:
+    """
+    Collect the hash values to hunt: the candidate hash constants in the
+     highlighted range, else the highlighted value (if `use_highlight`),
+     else the candidate hash constants of the current function.
+     IMPORTANT: This function should always be executed on the main thread.
+    """
+    start = idc.read_selection_start()
+    end = idc.read_selection_end()
+    if idaapi.BADADDR not in (start, end):
+        ranges = [(start, end)]
+    else:
+        hash_value = parse_highlighted_value() if use_highlight else None
+        if hash_value is not None:
+            return [hash_value]
+        function = ida_funcs.get_func(idc.here())
+        if function is None:
+            return None
+        ranges = list(idautils.Chunks(function.start_ea))
 
-    # Attempt to find matches
-    match_results = None
-    try:
-        # Send the hunt request
-        match_results = hunt_hash(hash_value, api_url=HASHDB_API_URL, timeout=timeout)
-    except (requests.exceptions.Timeout, requests.exceptions.ReadTimeout):
-        idaapi.msg("ERROR: HashDB API hunt hash request timed out.\n")
-        logging.exception("API request to {} timed out.".format(HASHDB_API_URL))
-        return None
-    
-    # Fix the results (algorithm sizes)
-    # TODO: At the moment we have to fetch the algorithms again to determine their sizes
-    #       (the hunt_result_form_t form expects the algorithm name and size)
-    algorithms = None
-    try:
-        # Send the hunt request
-        algorithms = get_algorithms(timeout=timeout)
-    except (requests.exceptions.Timeout, requests.exceptions.ReadTimeout):
-        idaapi.msg("ERROR: HashDB API algorithms request timed out.\n")
-        logging.exception("API request to {} timed out.".format(HASHDB_API_URL))
-        return None
-    results = []
-    for match in match_results:
-        for algorithm in algorithms:
-            if match == algorithm[0]:
-                results.append(algorithm)
-                break
-    
-    # Return the results
-    return results
+    # The algorithm (size) isn't known yet, collect both 32 and 64 bit constants
+    candidates = {}
+    for range_start, range_end in ranges:
+        for size in (32, 64):
+            candidates.update(collect_hash_candidates(size, range_start, range_end))
+    return list(candidates)
 
 
-def hunt_algorithm_run(timeout: Union[int, float] = 0) -> bool:
-    global HASHDB_REQUEST_LOCK, HASHDB_USE_XOR, HASHDB_XOR_VALUE
+def hunt_algorithm_run(timeout: Union[int, float] = 0) -> Union[None, Worker]:
+    global HASHDB_USE_XOR, HASHDB_XOR_VALUE
     
-    # Get the selected hash value
-    hash_value = parse_highlighted_value()
-    if hash_value is None:
+    # Get the selected hash value(s)
+    hash_values = collect_hunt_values()
+    if hash_values is None:
         idaapi.msg("HashDB ERROR: Invalid hash hash selection.\n")
         logging.warn("Failed to parse a hash value from the highligted text.")
-        return True # Release the lock
+        return None
+    if not hash_values:
+        idaapi.msg("HashDB: No hash candidates found to hunt.\n")
+        return None
+    if len(hash_values) > 1:
+        idaapi.msg("HashDB: Hunting {} hash candidates.\n".format(len(hash_values)))
     
-    # Xor option
-    if HASHDB_USE_XOR:
-        hash_value ^= HASHDB_XOR_VALUE
-
-    # Hunt the algorithm and show the hunt result form
-    worker = Worker(target=hunt_algorithm_request, args=(hash_value, timeout),
+    # Hunt the algorithm (xor option) and show the hunt result form
+    worker = Worker(target=hunt_algorithm_request, args=(hash_values, timeout,
+                                                         HASHDB_XOR_VALUE if HASHDB_USE_XOR else 0),
                     done_callback=hunt_algorithm_done, error_callback=hunt_algorithm_error)
     worker.start()
-    return False # Do not release the lock
+    return worker
 
 
 def hunt_algorithm():
     """
-    Search for an algorithm using a hash value.
+    Search for an algorithm using a hash value, or all candidate hash
+     values of the highlighted range or current function.
 
-    The function will spawn a new thread with a timeout (`HASHDB_REQUEST_TIMEOUT`).
-     While executing, the request lock is acquired.
+    The request is executed on the worker pool with a timeout (`HASHDB_REQUEST_TIMEOUT`),
+     other requests can run concurrently.
     """
-    # Check if we're already running a request
-    global HASHDB_REQUEST_LOCK, HASHDB_REQUEST_TIMEOUT
+    global HASHDB_REQUEST_TIMEOUT
     timeout_string = "{}".format(HASHDB_REQUEST_TIMEOUT) + " second{}".format('s' if HASHDB_REQUEST_TIMEOUT != 1 else "")
-    if HASHDB_REQUEST_LOCK.locked():
-        logging.debug("An async operation was requested, but the response lock was locked. Aborting.")
-        ida_kernwin.info("Please wait until the previous request is finished.\n" +
-                         "Requests timeout after {}.".format(timeout_string))
-        return
-
-    # Acquire the lock and execute the request
-    HASHDB_REQUEST_LOCK.acquire()
     idaapi.msg("HashDB: Hunting for a hash algorithm, please wait! Timeout: {}.\n".format(timeout_string))
-    release_lock = hunt_algorithm_run(timeout=HASHDB_REQUEST_TIMEOUT)
-    if release_lock:
-        HASHDB_REQUEST_LOCK.release()
+    hunt_algorithm_run(timeout=HASHDB_REQUEST_TIMEOUT)
 
 
 #--------------------------------------------------------------------------
@@ -1846,11 +2739,15 @@ class HashDB_Plugin_t(idaapi.plugin_t):
             print("=" * 80)
             # Load saved settings if they exist
             load_settings()
+            # Create the shared HTTP session (uses the loaded pool settings)
+            get_session()
             # initialize the menu actions our plugin will inject
             self._init_action_hash_lookup()
             self._init_action_set_xor()
+            self._init_action_solve_xor()
             self._init_action_hunt()
             self._init_action_iat_scan()
+            self._init_action_sweep()
             # initialize plugin hooks
             self._init_hooks()
 
@@ -1876,14 +2773,24 @@ class HashDB_Plugin_t(idaapi.plugin_t):
         # Save settings
         save_settings()
 
+        # Stop the worker pool
+        HASHDB_EXECUTOR.shutdown()
+
+        # Close the shared HTTP session and the result cache
+        close_session()
+        close_cache()
+        close_hash_indexes()
+
         # Unhook our plugin hooks
         self._hooks.unhook()
 
         # Unregister our actions & free their resources
         self._del_action_hash_lookup()
         self._del_action_set_xor()
+        self._del_action_solve_xor()
         self._del_action_hunt()
         self._del_action_iat_scan()
+        self._del_action_sweep()
 
         # Done
         self.terminated = True
@@ -1895,8 +2802,10 @@ class HashDB_Plugin_t(idaapi.plugin_t):
     #--------------------------------------------------------------------------
     ACTION_HASH_LOOKUP  = "hashdb:hash_lookup"
     ACTION_SET_XOR  = "hashdb:set_xor"
+    ACTION_SOLVE_XOR  = "hashdb:solve_xor"
     ACTION_HUNT  = "hashdb:hunt"
     ACTION_IAT_SCAN = "hashdb:iat_scan"
+    ACTION_SWEEP = "hashdb:sweep"
 
     def _init_action_hash_lookup(self):
         """
@@ -1929,6 +2838,22 @@ class HashDB_Plugin_t(idaapi.plugin_t):
         assert idaapi.register_action(action_desc), "Action registration failed"
 
 
+    def _init_action_solve_xor(self):
+        """
+        Register the solve xor action with IDA.
+        """
+        action_desc = idaapi.action_desc_t(
+            self.ACTION_SOLVE_XOR,         # The action name.
+            "HashDB Solve XOR key",                     # The action text.
+            IDACtxEntry(solve_xor),        # The action handler.
+            None,                  # Optional: action shortcut
+            "Derive the XOR key from the selected hashes",   # Optional: tooltip
+            XOR_ICON
+        )
+        # register the action with IDA
+        assert idaapi.register_action(action_desc), "Action registration failed"
+
+
     def _init_action_hunt(self):
         """
         Register the hunt action with IDA.
@@ -1960,6 +2885,22 @@ class HashDB_Plugin_t(idaapi.plugin_t):
         # register the action with IDA
         assert idaapi.register_action(action_desc), "Action registration failed"
 
+
+    def _init_action_sweep(self):
+        """
+        Register the database sweep action with IDA.
+        """
+        action_desc = idaapi.action_desc_t(
+            self.ACTION_SWEEP,         # The action name.
+            "HashDB Scan All",                     # The action text.
+            IDACtxEntry(hash_sweep),        # The action handler.
+            None,                  # Optional: action shortcut
+            "Scan all functions and data for hashes",   # Optional: tooltip
+            SCAN_ICON
+        )
+        # register the action with IDA
+        assert idaapi.register_action(action_desc), "Action registration failed"
+
     
     def _del_action_hash_lookup(self):
         idaapi.unregister_action(self.ACTION_HASH_LOOKUP)
@@ -1969,12 +2910,19 @@ class HashDB_Plugin_t(idaapi.plugin_t):
         idaapi.unregister_action(self.ACTION_SET_XOR)
 
 
+    def _del_action_solve_xor(self):
+        idaapi.unregister_action(self.ACTION_SOLVE_XOR)
+
+
     def _del_action_hunt(self):
         idaapi.unregister_action(self.ACTION_HUNT)
 
     def _del_action_iat_scan(self):
         idaapi.unregister_action(self.ACTION_IAT_SCAN)
 
+    def _del_action_sweep(self):
+        idaapi.unregister_action(self.ACTION_SWEEP)
+
 
     #--------------------------------------------------------------------------
     # Initialize Hooks
@@ -2039,6 +2987,13 @@ class Hooks(idaapi.UI_Hooks):
                 "HashDB set XOR key",
                 idaapi.SETMENU_APP,
             )
+            idaapi.attach_action_to_popup(
+                form,
+                popup,
+                HashDB_Plugin_t.ACTION_SOLVE_XOR,
+                "HashDB Solve XOR key",
+                idaapi.SETMENU_APP,
+            )
             idaapi.attach_action_to_popup(
                 form,
                 popup,
@@ -2053,6 +3008,23 @@ class Hooks(idaapi.UI_Hooks):
                 "HashDB Scan IAT",
                 idaapi.SETMENU_APP,
             )
+            idaapi.attach_action_to_popup(
+                form,
+                popup,
+                HashDB_Plugin_t.ACTION_SWEEP,
+                "HashDB Scan All",
+                idaapi.SETMENU_APP,
+            )
+
+        #
+        # the decompilation is complete, convert the hash constants
+        # in the (final) ctree to the hash enum
+        #
+
+        elif event == idaapi.hxe_maturity:
+            cfunc, maturity = args
+            if maturity == idaapi.CMAT_FINAL:
+                convert_decompiler_hashes(cfunc)
 
         # done
         return 0
@@ -2089,6 +3061,14 @@ def inject_actions(form, popup, form_type):
             idaapi.SETMENU_APP
         )
 
+        idaapi.attach_action_to_popup(
+            form,
+            popup,
+            HashDB_Plugin_t.ACTION_SOLVE_XOR,
+            "HashDB Solve XOR key",
+            idaapi.SETMENU_APP
+        )
+
         idaapi.attach_action_to_popup(
             form,
             popup,
@@ -2096,6 +3076,13 @@ def inject_actions(form, popup, form_type):
             "HashDB Hunt Algorithm",
             idaapi.SETMENU_APP
         )
+        idaapi.attach_action_to_popup(
+            form,
+            popup,
+            HashDB_Plugin_t.ACTION_SWEEP,
+            "HashDB Scan All",
+            idaapi.SETMENU_APP
+        )
         if form_type != idaapi.BWN_PSEUDOCODE:
             idaapi.attach_action_to_popup(
                 form,
@@ -2135,6 +3122,201 @@ class IDACtxEntry(idaapi.action_handler_t):
         return idaapi.AST_ENABLE_ALWAYS
 
 
+#--------------------------------------------------------------------------
+# Headless batch mode
+#--------------------------------------------------------------------------
+def load_batch_settings(config_path: str = None) -> dict:
+    """
+    Load the batch settings from a JSON file and the environment,
+     environment variables (`HASHDB_API_URL`, `HASHDB_ALGORITHM`, ...)
+     take precedence over the file.
+
+    Returns the settings which aren't global HashDB settings (e.g. `report`).
+    """
+    global HASHDB_API_URL, HASHDB_USE_XOR, HASHDB_XOR_VALUE, ENUM_PREFIX, \
+           HASHDB_REQUEST_TIMEOUT, HASHDB_RETRIES, HASHDB_ERROR_BUDGET, HASHDB_RATE_LIMIT, \
+           HASHDB_MAX_IN_FLIGHT, HASHDB_USE_CACHE, HASHDB_OFFLINE, \
+           HASHDB_COLLISION_POLICY, HASHDB_ALGORITHM, HASHDB_ALGORITHM_SIZE
+    settings = {}
+    if config_path:
+        with open(config_path, "r") as config_file:
+            settings.update({key.lower(): value for key, value in json.load(config_file).items()})
+    for key, value in os.environ.items():
+        if key.startswith("HASHDB_"):
+            settings[key[len("HASHDB_"):].lower()] = value
+
+    def parse_bool(value) -> bool:
+        return value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes")
+
+    def parse_int(value) -> int:
+        return value if isinstance(value, int) else int(str(value), 0)
+
+    if "api_url" in settings:
+        HASHDB_API_URL = settings.pop("api_url")
+    if "xor_value" in settings:
+        HASHDB_XOR_VALUE = parse_int(settings.pop("xor_value"))
+        HASHDB_USE_XOR = True
+    if "use_xor" in settings:
+        HASHDB_USE_XOR = parse_bool(settings.pop("use_xor"))
+    if "enum_prefix" in settings:
+        ENUM_PREFIX = settings.pop("enum_prefix")
+    if "request_timeout" in settings:
+        HASHDB_REQUEST_TIMEOUT = float(settings.pop("request_timeout"))
+    if "retries" in settings:
+        HASHDB_RETRIES = parse_int(settings.pop("retries"))
+    if "error_budget" in settings:
+        HASHDB_ERROR_BUDGET = parse_int(settings.pop("error_budget"))
+    if "rate_limit" in settings:
+        HASHDB_RATE_LIMIT = float(settings.pop("rate_limit"))
+    if "max_in_flight" in settings:
+        HASHDB_MAX_IN_FLIGHT = parse_int(settings.pop("max_in_flight"))
+    if "use_cache" in settings:
+        HASHDB_USE_CACHE = parse_bool(settings.pop("use_cache"))
+    if "offline" in settings:
+        HASHDB_OFFLINE = parse_bool(settings.pop("offline"))
+    if "collision_policy" in settings:
+        policy = str(settings.pop("collision_policy")).lower()
+        if policy not in HASHDB_COLLISION_POLICIES:
+            raise HashDBError("Unknown collision policy: {}".format(policy))
+        HASHDB_COLLISION_POLICY = policy
+    configure_core()
+    if "algorithm" in settings:
+        algorithm = settings.pop("algorithm")
+        size = settings.pop("algorithm_size", None)
+        if size is None:
+            # Look the size up in the (cached) algorithm list
+            for name, algorithm_size in get_cached_algorithms(HASHDB_API_URL, HASHDB_REQUEST_TIMEOUT):
+                if name == algorithm and algorithm_size != 'Unknown':
+                    size = algorithm_size
+                    break
+        if size is None or not set_algorithm(algorithm, size):
+            raise HashDBError("Unable to set the algorithm: {}".format(algorithm))
+    return settings
+
+
+def hash_sweep_batch() -> dict:
+    """
+    Synchronously scan the whole database for hashes, resolve them and
+     convert the resolved constants to enums, without showing any forms.
+
+    Returns a report of the resolved hashes.
+    """
+    global HASHDB_ALGORITHM, HASHDB_ALGORITHM_SIZE, HASHDB_API_URL, \
+           HASHDB_USE_XOR, HASHDB_XOR_VALUE, HASHDB_REQUEST_TIMEOUT, HASHDB_COLLISION_POLICY
+    if HASHDB_ALGORITHM is None:
+        raise HashDBError("No hash algorithm selected")
+
+    start_time = time.time()
+    xor_value = HASHDB_XOR_VALUE if HASHDB_USE_XOR else 0
+    report = {
+        "input_file": ida_nalt.get_input_file_path(),
+        "md5": (ida_nalt.retrieve_input_file_md5() or b"").hex(),
+        "algorithm": HASHDB_ALGORITHM,
+        "xor_value": xor_value,
+        "collision_policy": HASHDB_COLLISION_POLICY,
+        "candidates": 0,
+        "locations": 0,
+        "unresolved": 0,
+        "resolved": [],
+        "collisions": []
+    }
+
+    candidates = collect_hash_candidates(HASHDB_ALGORITHM_SIZE)
+    report["candidates"] = len(candidates)
+    report["locations"] = sum(len(locations) for locations in candidates.values())
+    if candidates:
+        hash_results = get_strings_from_hashes(HASHDB_ALGORITHM, list(candidates.keys()), xor_value,
+                                               HASHDB_API_URL, HASHDB_REQUEST_TIMEOUT)
+        report["unresolved"] = report_unresolved(hash_results, candidates.keys())
+        hash_results = {hash_value: hashes for hash_value, hashes in hash_results.items() if hashes}
+        enum_id, resolved = add_resolved_hashes(hash_results)
+
+        SERIAL = 0
+        for hash_value, hashes in hash_results.items():
+            if len(hashes) > 1:
+                report["collisions"].append({
+                    "hash": hash_value,
+                    "strings": [get_hash_string_value(entry.get("string", {})) for entry in hashes],
+                    "selected": resolved[hash_value][0] if hash_value in resolved else None
+                })
+            if hash_value not in resolved:
+                continue
+            name, string_object = resolved[hash_value]
+            if enum_id is not None:
+                for ea, operand in candidates[hash_value]:
+                    ida_bytes.op_enum(ea, operand, enum_id, SERIAL)
+            report["resolved"].append({
+                "hash": hash_value,
+                "string": name,
+                "is_api": string_object.get("is_api", False),
+                "modules": string_object.get("modules", []),
+                "locations": [ea for ea, _ in candidates[hash_value]]
+            })
+    report["elapsed"] = time.time() - start_time
+    return report
+
+
+def batch_main():
+    """
+    Entry point for batch jobs (idat -A -S"hashdb.py [--config settings.json] [--report report.json]").
+
+    Settings are loaded from the database, then the config file and then the environment.
+     The report is written to the `--report` path (or the `report` setting) and IDA
+     exits with status 0 on success.
+    """
+    global HASHDB_HEADLESS, HASHDB_EXECUTOR
+    HASHDB_HEADLESS = True
+    arguments = idc.ARGV[1:]
+    def get_argument(name: str) -> Union[None, str]:
+        if name in arguments and arguments.index(name) + 1 < len(arguments):
+            return arguments[arguments.index(name) + 1]
+        return None
+
+    exit_code = 0
+    report = {}
+    report_path = get_argument("--report")
+    try:
+        ida_auto.auto_wait()
+        load_settings()
+        settings = load_batch_settings(get_argument("--config"))
+        report_path = report_path or settings.get("report")
+        report = hash_sweep_batch()
+        report["status"] = "ok"
+    except Exception as exception:
+        logging.exception("HashDB batch job failed:")
+        report["status"] = "error"
+        report["error"] = str(exception)
+        exit_code = 1
+
+    if report_path is None:
+        report_path = ida_nalt.get_input_file_path() + ".hashdb.json"
+    try:
+        with open(report_path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    except OSError:
+        logging.exception("Unable to write the HashDB report to {}:".format(report_path))
+        exit_code = 1
+
+    HASHDB_EXECUTOR.shutdown()
+    close_session()
+    close_cache()
+    close_hash_indexes()
+    idc.qexit(exit_code)
+
+
+def is_batch_run() -> bool:
+    """
+    A script run is only a batch job when IDA runs headless (`idat -A`), when the
+     script got batch arguments (`--config`/`--report`) or when `HASHDB_BATCH` is set.
+     Loading the file with File > Script file in the GUI must not exit IDA.
+    """
+    if ida_kernwin.cvar.batch:
+        return True
+    if any(argument in ("--config", "--report") for argument in idc.ARGV[1:]):
+        return True
+    return os.environ.get("HASHDB_BATCH", "").lower() in ("1", "true", "yes")
+
+
 #--------------------------------------------------------------------------
 # Plugin Registration
 #--------------------------------------------------------------------------
@@ -2145,6 +3327,14 @@ p_initialized = False
 # Global plugin object
 HASHDB_PLUGIN_OBJECT = None
 
+# Global worker pool
+HASHDB_EXECUTOR = WorkerExecutor(HASHDB_MAX_WORKERS)
+
 # Register IDA plugin
 def PLUGIN_ENTRY():
     return HashDB_Plugin_t()
+
+
+# Running as a batch script (idat -A -S), run the batch job
+if __name__ == "__main__" and is_batch_run():
+    batch_main()
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""
+HashDB core library, everything HashDB does that doesn't depend on IDA:
+ the API client, result cache, local hashing engine, hash indexes and
+ result shaping. The IDA plugin (hashdb.py) is a thin layer on top.
+"""
+from .config import VERSION, configure
+from .errors import HashDBError
+from .cache import HashCache, get_cache, close_cache
+from .local import (LOCAL_ALGORITHMS, LOCAL_CORPUS, load_local_corpus, get_local_hash_table,
+                    get_local_strings_from_hash, get_local_module_hashes, hunt_local, hunt_local_hashes,
+                    solve_xor_key)
+from .index import HashIndex, get_index_directory, get_hash_index, close_hash_index, close_hash_indexes
+from .results import COLLISION_POLICIES, clean_hash_results, get_hash_string_value, resolve_collision, is_sentinel_hash
+from .client import (create_session, get_session, close_session,
+                     get_algorithms, parse_algorithms, get_cached_algorithms, peek_cached_algorithms,
+                     get_strings_from_hash, get_strings_from_hashes,
+                     get_module_hashes, iter_module_hashes, iter_json_array,
+                     hunt_hash, hunt_hashes, determine_algorithm_size, build_hash_index)
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Command line interface to the HashDB core, e.g.:
+    python -m hashdb_core lookup crc32 0xc97c1fff
+    python -m hashdb_core hunt 0xc97c1fff
+    python -m hashdb_core hunt-local 0xc97c0dcb 0x3fc1afb9 --xor 0x1234
+    python -m hashdb_core solve-xor 0xc97c0dcb 0x3fc1afb9 0xcef2ff9c --algorithm crc32
+    python -m hashdb_core build-index ror13_add kernel32 ntdll --permutation api
+"""
+import argparse
+import json
+import sys
+
+from . import config
+from .client import build_hash_index, get_cached_algorithms, get_strings_from_hashes, hunt_hashes
+from .local import LOCAL_ALGORITHMS, hunt_local_hashes, solve_xor_key
+
+
+def main(arguments: list = None) -> int:
+    parser = argparse.ArgumentParser(prog="hashdb_core", description="HashDB lookups without IDA")
+    parser.add_argument("--api-url", default=config.HASHDB_API_URL)
+    parser.add_argument("--timeout", type=float, default=config.HASHDB_REQUEST_TIMEOUT)
+    parser.add_argument("--data-directory", default=config.HASHDB_DATA_DIRECTORY)
+    parser.add_argument("--offline", action="store_true", help="only use the local hashing engine")
+    parser.add_argument("--no-cache", action="store_true", help="don't use the result cache")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("algorithms", help="list the available algorithms")
+
+    lookup = commands.add_parser("lookup", help="resolve hash values")
+    lookup.add_argument("algorithm")
+    lookup.add_argument("hashes", nargs="+", type=lambda value: int(value, 0))
+    lookup.add_argument("--xor", type=lambda value: int(value, 0), default=0)
+
+    hunt = commands.add_parser("hunt", help="rank the algorithms by the hash values they produce")
+    hunt.add_argument("hashes", nargs="+", type=lambda value: int(value, 0))
+
+    hunt_local = commands.add_parser("hunt-local", help="rank the local algorithms by the hash values they produce")
+    hunt_local.add_argument("hashes", nargs="+", type=lambda value: int(value, 0))
+    hunt_local.add_argument("--xor", type=lambda value: int(value, 0), default=0)
+
+    solve_xor = commands.add_parser("solve-xor", help="derive the xor key of hash values from the local algorithms")
+    solve_xor.add_argument("hashes", nargs="+", type=lambda value: int(value, 0))
+    solve_xor.add_argument("--algorithm", choices=sorted(LOCAL_ALGORITHMS))
+
+    index = commands.add_parser("build-index", help="build a hash index from module hash lists")
+    index.add_argument("algorithm")
+    index.add_argument("modules", nargs="+")
+    index.add_argument("--permutation", default="api")
+
+    arguments = parser.parse_args(arguments)
+    config.configure(api_url=arguments.api_url, request_timeout=arguments.timeout,
+                     data_directory=arguments.data_directory,
+                     offline=arguments.offline, use_cache=not arguments.no_cache)
+
+    if arguments.command == "algorithms":
+        result = get_cached_algorithms(arguments.api_url, arguments.timeout)
+    elif arguments.command == "lookup":
+        result = {hex(hash_value): hashes for hash_value, hashes in
+                  get_strings_from_hashes(arguments.algorithm, arguments.hashes, arguments.xor,
+                                          arguments.api_url, arguments.timeout).items()}
+    elif arguments.command == "hunt":
+        result = [{"algorithm": algorithm, "hits": hits} for algorithm, hits in
+                  hunt_hashes(arguments.hashes, arguments.api_url, arguments.timeout)]
+    elif arguments.command == "hunt-local":
+        result = [{"algorithm": algorithm, "hits": hits} for algorithm, hits in hunt_local_hashes(arguments.hashes, arguments.xor)]
+    elif arguments.command == "solve-xor":
+        result = [{"algorithm": algorithm, "xor": hex(key), "hits": hits}
+                  for algorithm, key, hits in solve_xor_key(arguments.hashes, arguments.algorithm)]
+    else:
+        result = {"indexed": build_hash_index(arguments.algorithm, arguments.modules, arguments.permutation,
+                                              arguments.api_url, arguments.timeout)}
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
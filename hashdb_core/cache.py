@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent (sqlite) cache of hash lookup and module results.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Union
+
+from . import config
+
+# Shared cache, opened on first use
+HASHDB_CACHE = None
+
+
+class HashCache:
+    """
+    Persistent cache of hash lookup results, stored in a sqlite database
+     in the data directory and shared by all databases.
+
+    Results are keyed by (api url, algorithm, hash value), every result
+     carries its own permutation. Empty results (misses) are cached too,
+     but expire sooner.
+
+    Module hashes are stored in chunks of `MODULE_CHUNK_SIZE` entries, so
+     streamed modules can be written and read without holding them in memory.
+    """
+    EVICTION_INTERVAL = 1000 # Check the cache size every n insertions
+    MODULE_CHUNK_SIZE = 1000 # Module hash entries per stored chunk
+
+    def __init__(self, path: str, ttl: int = 0, negative_ttl: int = 0, max_entries: int = 0):
+        self.path = path
+        self.ttl = ttl or config.HASHDB_CACHE_TTL
+        self.negative_ttl = negative_ttl or config.HASHDB_CACHE_NEGATIVE_TTL
+        self.max_entries = max_entries or config.HASHDB_CACHE_MAX_ENTRIES
+        self.lock = threading.Lock()
+        self.insertions = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS hashes ("
+                                    "api_url TEXT, algorithm TEXT, hash TEXT, results TEXT, "
+                                    "created REAL, accessed REAL, "
+                                    "PRIMARY KEY (api_url, algorithm, hash))")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS hashes_accessed ON hashes (accessed)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS modules ("
+                                    "api_url TEXT, module TEXT, algorithm TEXT, permutation TEXT, results TEXT, "
+                                    "created REAL, accessed REAL, "
+                                    "PRIMARY KEY (api_url, module, algorithm, permutation))")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS module_chunks ("
+                                    "api_url TEXT, module TEXT, algorithm TEXT, permutation TEXT, chunk INTEGER, results TEXT, "
+                                    "PRIMARY KEY (api_url, module, algorithm, permutation, chunk))")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS permutations ("
+                                    "api_url TEXT, algorithm TEXT, permutation TEXT, seen REAL, "
+                                    "PRIMARY KEY (api_url, algorithm, permutation))")
+
+    def get(self, api_url: str, algorithm: str, hash_value: int) -> Union[None, list]:
+        """
+        Returns the cached hash list, or None if it isn't cached (or expired).
+        """
+        key = (api_url, algorithm, str(hash_value))
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT results, created FROM hashes WHERE api_url = ? AND algorithm = ? AND hash = ?", key).fetchone()
+            if row is None:
+                return None
+            hashes = json.loads(row[0])
+            ttl = self.ttl if hashes else self.negative_ttl
+            if now - row[1] > ttl:
+                self.connection.execute("DELETE FROM hashes WHERE api_url = ? AND algorithm = ? AND hash = ?", key)
+                return None
+            self.connection.execute("UPDATE hashes SET accessed = ? WHERE api_url = ? AND algorithm = ? AND hash = ?", (now, *key))
+        return hashes
+
+    def put(self, api_url: str, algorithm: str, hash_value: int, hashes: list):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?)",
+                                    (api_url, algorithm, str(hash_value), json.dumps(hashes), now, now))
+            self.insertions += 1
+            if self.insertions % self.EVICTION_INTERVAL == 0:
+                self._evict()
+
+    def get_module(self, api_url: str, module_name: str, algorithm: str, permutation: str) -> Union[None, dict]:
+        """
+        Returns the cached module hashes, or None if they aren't cached (or expired).
+        """
+        hashes = self.iter_module(api_url, module_name, algorithm, permutation)
+        if hashes is None:
+            return None
+        return {'hashes': list(hashes)}
+
+    def iter_module(self, api_url: str, module_name: str, algorithm: str, permutation: str):
+        """
+        Returns an iterator over the cached module hash entries (read one chunk
+         at a time), or None if they aren't cached (or expired).
+        """
+        key = (api_url, module_name.lower(), algorithm, permutation)
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT results, created FROM modules WHERE api_url = ? AND module = ? "
+                                          "AND algorithm = ? AND permutation = ?", key).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self.connection.execute("DELETE FROM modules WHERE api_url = ? AND module = ? "
+                                        "AND algorithm = ? AND permutation = ?", key)
+                self.connection.execute("DELETE FROM module_chunks WHERE api_url = ? AND module = ? "
+                                        "AND algorithm = ? AND permutation = ?", key)
+                return None
+            self.connection.execute("UPDATE modules SET accessed = ? WHERE api_url = ? AND module = ? "
+                                    "AND algorithm = ? AND permutation = ?", (now, *key))
+        # Modules cached by previous versions are stored in one piece
+        if row[0] is not None:
+            return iter(json.loads(row[0]).get('hashes', []))
+
+        def iter_chunks():
+            chunk = 0
+            while True:
+                with self.lock:
+                    chunk_row = self.connection.execute("SELECT results FROM module_chunks WHERE api_url = ? AND module = ? "
+                                                        "AND algorithm = ? AND permutation = ? AND chunk = ?",
+                                                        (*key, chunk)).fetchone()
+                if chunk_row is None:
+                    return
+                yield from json.loads(chunk_row[0])
+                chunk += 1
+        return iter_chunks()
+
+    def put_module(self, api_url: str, module_name: str, algorithm: str, permutation: str, results: dict):
+        hashes = results.get('hashes', [])
+        self.begin_module(api_url, module_name, algorithm, permutation)
+        for chunk, start in enumerate(range(0, len(hashes), self.MODULE_CHUNK_SIZE)):
+            self.put_module_chunk(api_url, module_name, algorithm, permutation, chunk,
+                                  hashes[start:start + self.MODULE_CHUNK_SIZE])
+        self.finish_module(api_url, module_name, algorithm, permutation)
+
+    def begin_module(self, api_url: str, module_name: str, algorithm: str, permutation: str):
+        """
+        Start writing the hashes of a module in chunks (see `put_module_chunk`),
+         the module is only served once `finish_module` is called.
+        """
+        key = (api_url, module_name.lower(), algorithm, permutation)
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM modules WHERE api_url = ? AND module = ? "
+                                    "AND algorithm = ? AND permutation = ?", key)
+            self.connection.execute("DELETE FROM module_chunks WHERE api_url = ? AND module = ? "
+                                    "AND algorithm = ? AND permutation = ?", key)
+
+    def put_module_chunk(self, api_url: str, module_name: str, algorithm: str, permutation: str,
+                         chunk: int, hashes: list):
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO module_chunks VALUES (?, ?, ?, ?, ?, ?)",
+                                    (api_url, module_name.lower(), algorithm, permutation, chunk, json.dumps(hashes)))
+
+    def finish_module(self, api_url: str, module_name: str, algorithm: str, permutation: str):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO modules VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                    (api_url, module_name.lower(), algorithm, permutation, None, now, now))
+
+    def add_permutation(self, api_url: str, algorithm: str, permutation: str):
+        """
+        Remember a permutation seen in a lookup result, used to prefetch modules.
+        """
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO permutations VALUES (?, ?, ?, ?)",
+                                    (api_url, algorithm, permutation, time.time()))
+
+    def get_permutations(self, api_url: str, algorithm: str) -> list:
+        with self.lock, self.connection:
+            rows = self.connection.execute("SELECT permutation FROM permutations WHERE api_url = ? AND algorithm = ? "
+                                           "ORDER BY seen DESC", (api_url, algorithm)).fetchall()
+        return [row[0] for row in rows]
+
+    def _evict(self):
+        """
+        Remove expired entries, then the least recently used entries
+         above the size limit. The lock must be held by the caller.
+        """
+        now = time.time()
+        self.connection.execute("DELETE FROM modules WHERE created < ?", (now - self.ttl,))
+        # Chunks of expired modules, and of downloads which didn't complete
+        self.connection.execute("DELETE FROM module_chunks WHERE (api_url, module, algorithm, permutation) NOT IN "
+                                "(SELECT api_url, module, algorithm, permutation FROM modules)")
+        self.connection.execute("DELETE FROM hashes WHERE (results = '[]' AND created < ?) OR created < ?",
+                                (now - self.negative_ttl, now - self.ttl))
+        count = self.connection.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+        if count > self.max_entries:
+            self.connection.execute("DELETE FROM hashes WHERE rowid IN "
+                                    "(SELECT rowid FROM hashes ORDER BY accessed ASC LIMIT ?)",
+                                    (count - self.max_entries,))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def get_cache() -> Union[None, HashCache]:
+    """
+    Return the shared result cache, or None if caching is disabled.
+    """
+    global HASHDB_CACHE
+    if not config.HASHDB_USE_CACHE:
+        return None
+    if HASHDB_CACHE is None:
+        try:
+            HASHDB_CACHE = HashCache(os.path.join(config.HASHDB_DATA_DIRECTORY, "cache.sqlite"))
+        except (OSError, sqlite3.Error) as exception:
+            logging.error("HashDB failed to open the result cache, caching disabled: {}".format(exception))
+            config.HASHDB_USE_CACHE = False
+            return None
+    return HASHDB_CACHE
+
+
+def close_cache():
+    global HASHDB_CACHE
+    if HASHDB_CACHE is not None:
+        HASHDB_CACHE.close()
+        HASHDB_CACHE = None
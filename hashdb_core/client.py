@@ -0,0 +1,679 @@
+# -*- coding: utf-8 -*-
+"""
+HashDB API client: pooled session, single and bulk lookups, module
+ downloads and algorithm hunting, backed by the local engine, index and cache.
+"""
+import codecs
+import concurrent.futures
+import email.utils
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import config
+from .cache import get_cache
+from .errors import HashDBError
+from .index import HashIndex, close_hash_index, get_hash_index, get_index_directory
+from .local import LOCAL_ALGORITHMS, get_local_module_hashes, get_local_strings_from_hash, hunt_local_hashes
+from .results import clean_hash_results
+
+# Shared HTTP session, created on first use
+HASHDB_SESSION = None
+HASHDB_SESSION_LOCK = threading.Lock()
+
+# API urls without bulk lookup support
+HASHDB_BULK_UNSUPPORTED = set()
+
+# Cached algorithm catalogs (api url -> {"algorithms", "etag", "timestamp"})
+HASHDB_ALGORITHM_CATALOG = {}
+HASHDB_ALGORITHM_CATALOG_LOCK = threading.Lock()
+
+
+#--------------------------------------------------------------------------
+# HTTP session
+#--------------------------------------------------------------------------
+def create_session(pool_connections: int = 0, pool_maxsize: int = 0) -> requests.Session:
+    """
+    Create a pooled HTTP session, connections are kept alive between requests.
+    """
+    if not pool_connections:
+        pool_connections = config.HASHDB_POOL_CONNECTIONS
+    if not pool_maxsize:
+        pool_maxsize = config.HASHDB_POOL_MAXSIZE
+
+    session = requests.Session()
+    session.headers.update({"Connection": "keep-alive",
+                            "User-Agent": config.HASHDB_USER_AGENT})
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Return the shared HTTP session, creating it if required.
+    """
+    global HASHDB_SESSION, HASHDB_SESSION_LOCK
+    with HASHDB_SESSION_LOCK:
+        if HASHDB_SESSION is None:
+            HASHDB_SESSION = create_session()
+        return HASHDB_SESSION
+
+
+def close_session():
+    """
+    Close the shared HTTP session and all of its pooled connections.
+    """
+    global HASHDB_SESSION, HASHDB_SESSION_LOCK
+    with HASHDB_SESSION_LOCK:
+        if HASHDB_SESSION is not None:
+            HASHDB_SESSION.close()
+            HASHDB_SESSION = None
+
+
+#--------------------------------------------------------------------------
+# Rate limiting
+#--------------------------------------------------------------------------
+class RateLimiter:
+    """
+    Token bucket rate limiter combined with a limit of requests in flight.
+
+    The limits are read from the config on every request, so they can be
+     changed at any time; a limit of 0 disables it.
+    """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.tokens = None
+        self.updated = time.monotonic()
+        self.in_flight = 0
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback_object):
+        self.release()
+        return False
+
+    def acquire(self):
+        """
+        Block until a request may be sent.
+        """
+        with self.condition:
+            while True:
+                max_in_flight = config.HASHDB_MAX_IN_FLIGHT
+                if max_in_flight and self.in_flight >= max_in_flight:
+                    self.condition.wait()
+                    continue
+
+                rate = config.HASHDB_RATE_LIMIT
+                if rate > 0:
+                    burst = max(1, config.HASHDB_RATE_BURST)
+                    now = time.monotonic()
+                    if self.tokens is None:
+                        self.tokens = burst
+                    self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+                    self.updated = now
+                    if self.tokens < 1:
+                        self.condition.wait((1 - self.tokens) / rate)
+                        continue
+                    self.tokens -= 1
+                break
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+
+# Shared by all requests
+HASHDB_RATE_LIMITER = RateLimiter()
+
+
+#--------------------------------------------------------------------------
+# Retries
+#--------------------------------------------------------------------------
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def get_retry_delay(attempt: int, response: requests.Response = None) -> float:
+    """
+    Returns the delay before a retry: the server's Retry-After if provided,
+     exponential backoff with full jitter otherwise.
+    """
+    retry_after = response.headers.get("Retry-After", None) if response is not None else None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            # HTTP date
+            try:
+                delay = email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0), config.HASHDB_RETRY_MAX_BACKOFF)
+    delay = min(config.HASHDB_RETRY_BACKOFF * (2 ** attempt), config.HASHDB_RETRY_MAX_BACKOFF)
+    return random.uniform(0, delay)
+
+
+def send_request(method: str, url: str, retries: int = None, cancel_event: threading.Event = None,
+                 **kwargs) -> requests.Response:
+    """
+    Send a request with the shared session, transient failures (connection
+     errors, timeouts, 429 and 5xx responses) are retried with backoff.
+     Every attempt is subject to the rate limiter (`HASHDB_RATE_LIMITER`),
+     streamed responses only count as in flight until their headers arrive.
+
+    The last response is returned if the retries are exhausted, so callers
+     handle the status code as usual; the last exception is raised otherwise.
+     Once the optional `cancel_event` is set no further attempts are made.
+    """
+    if retries is None:
+        retries = config.HASHDB_RETRIES
+    for attempt in range(retries + 1):
+        if cancel_event is not None and cancel_event.is_set():
+            raise HashDBError("Request to %s cancelled" % url)
+        try:
+            with HASHDB_RATE_LIMITER:
+                response = get_session().request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as exception:
+            if attempt >= retries:
+                raise
+            delay = get_retry_delay(attempt)
+            logging.debug("{} {} failed ({}), retrying in {:.2f} seconds".format(method, url, exception, delay))
+        else:
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                return response
+            delay = get_retry_delay(attempt, response)
+            logging.debug("{} {} failed (status {}), retrying in {:.2f} seconds".format(method, url, response.status_code, delay))
+            response.close()
+        if cancel_event is not None:
+            cancel_event.wait(delay)
+        else:
+            time.sleep(delay)
+
+
+#--------------------------------------------------------------------------
+# HashDB API
+#--------------------------------------------------------------------------
+def get_algorithms(api_url='https://hashdb.openanalysis.net', timeout=None):
+    # Handle an empty timeout
+    if timeout is None:
+        timeout = config.HASHDB_REQUEST_TIMEOUT
+
+    # Offline mode only knows about the locally implemented algorithms
+    if config.HASHDB_OFFLINE:
+        return [[algorithm, str(size)] for algorithm, (_, size) in LOCAL_ALGORITHMS.items()]
+
+    algorithms_url = api_url + '/hash'
+    r = send_request("GET", algorithms_url, timeout=timeout)
+    if not r.ok:
+        raise HashDBError("Get algorithms API request failed, status %s" % r.status_code)
+    return parse_algorithms(r.json())
+
+
+def parse_algorithms(results: dict) -> list:
+    algorithms = []
+    for algorithm in results.get('algorithms',[]):
+        size = determine_algorithm_size(algorithm.get('type', None))
+        if size == 'Unknown':
+            logging.warning("Unknown algorithm type encountered when fetching algorithms: %s" % algorithm.get('type', None))
+        algorithms.append([algorithm.get('algorithm'), size])
+    return algorithms
+
+
+def get_cached_algorithms(api_url='https://hashdb.openanalysis.net', timeout=None, refresh=False):
+    """
+    Return the algorithm catalog of an API, fetching it only when it isn't
+     cached or is older than `config.HASHDB_ALGORITHM_CATALOG_TTL` (or `refresh` is set).
+     Refreshes are conditional (ETag), so an unchanged catalog isn't downloaded again.
+
+    The catalog is kept in memory and persisted in the data directory.
+    """
+    global HASHDB_ALGORITHM_CATALOG, HASHDB_ALGORITHM_CATALOG_LOCK
+    if timeout is None:
+        timeout = config.HASHDB_REQUEST_TIMEOUT
+    if config.HASHDB_OFFLINE:
+        return get_algorithms(api_url, timeout)
+
+    with HASHDB_ALGORITHM_CATALOG_LOCK:
+        if not HASHDB_ALGORITHM_CATALOG:
+            HASHDB_ALGORITHM_CATALOG = load_algorithm_catalog()
+        entry = HASHDB_ALGORITHM_CATALOG.get(api_url, None)
+    if entry is not None and not refresh and time.time() - entry.get("timestamp", 0) < config.HASHDB_ALGORITHM_CATALOG_TTL:
+        return entry["algorithms"]
+
+    headers = {}
+    if entry is not None and entry.get("etag", None):
+        headers["If-None-Match"] = entry["etag"]
+    try:
+        r = send_request("GET", api_url + '/hash', headers=headers, timeout=timeout)
+    except requests.RequestException:
+        # Stale is better than nothing
+        if entry is not None:
+            logging.exception("Algorithm catalog request to {} failed, using the cached catalog.".format(api_url))
+            return entry["algorithms"]
+        raise
+
+    if r.status_code == 304 and entry is not None:
+        entry = dict(entry, timestamp=time.time())
+    elif r.ok:
+        entry = {"algorithms": parse_algorithms(r.json()),
+                 "etag": r.headers.get("ETag", None),
+                 "timestamp": time.time()}
+    else:
+        raise HashDBError("Get algorithms API request failed, status %s" % r.status_code)
+
+    with HASHDB_ALGORITHM_CATALOG_LOCK:
+        HASHDB_ALGORITHM_CATALOG[api_url] = entry
+        save_algorithm_catalog(HASHDB_ALGORITHM_CATALOG)
+    return entry["algorithms"]
+
+
+def peek_cached_algorithms(api_url='https://hashdb.openanalysis.net') -> list:
+    """
+    Return the cached algorithm catalog of an API without sending any requests.
+    """
+    global HASHDB_ALGORITHM_CATALOG, HASHDB_ALGORITHM_CATALOG_LOCK
+    with HASHDB_ALGORITHM_CATALOG_LOCK:
+        if not HASHDB_ALGORITHM_CATALOG:
+            HASHDB_ALGORITHM_CATALOG = load_algorithm_catalog()
+        entry = HASHDB_ALGORITHM_CATALOG.get(api_url, None)
+    return entry["algorithms"] if entry is not None else []
+
+
+def get_algorithm_catalog_path() -> str:
+    return os.path.join(config.HASHDB_DATA_DIRECTORY, "algorithms.json")
+
+
+def load_algorithm_catalog() -> dict:
+    path = get_algorithm_catalog_path()
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, "r") as catalog_file:
+            return json.load(catalog_file)
+    except (OSError, ValueError) as exception:
+        logging.warning("Failed to load the algorithm catalog {}: {}".format(path, exception))
+        return {}
+
+
+def save_algorithm_catalog(catalog: dict):
+    path = get_algorithm_catalog_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as catalog_file:
+            json.dump(catalog, catalog_file)
+    except OSError as exception:
+        logging.warning("Failed to save the algorithm catalog {}: {}".format(path, exception))
+
+
+def get_strings_from_hash(algorithm, hash_value, xor_value=0, api_url='https://hashdb.openanalysis.net', timeout=None,
+                          cancel_event: threading.Event = None):
+    # Handle an empty timeout
+    if timeout is None:
+        timeout = config.HASHDB_REQUEST_TIMEOUT
+
+    hash_value ^= xor_value
+
+    # Try the local engine first
+    local_hashes = get_local_strings_from_hash(algorithm, hash_value)
+    if not local_hashes:
+        index = get_hash_index(algorithm)
+        if index is not None:
+            local_hashes = index.lookup(hash_value)
+    if local_hashes or config.HASHDB_OFFLINE:
+        return {'hashes':local_hashes or []}
+
+    cache = get_cache()
+    if cache is not None:
+        hashes = cache.get(api_url, algorithm, hash_value)
+        if hashes is not None:
+            return {'hashes':hashes}
+
+    hash_url = api_url + '/hash/%s/%d' % (algorithm, hash_value)
+    r = send_request("GET", hash_url, timeout=timeout, cancel_event=cancel_event)
+    if not r.ok:
+        raise HashDBError("Get hash API request failed, status %s" % r.status_code)
+    results = r.json()
+    hashes = clean_hash_results(results.get('hashes',[]))
+    if cache is not None:
+        cache.put(api_url, algorithm, hash_value, hashes)
+    return {'hashes':hashes}
+
+
+def get_strings_from_hashes(algorithm, hash_values, xor_value=0, api_url='https://hashdb.openanalysis.net', timeout=None, batch_size=None,
+                            progress_callback: Callable = None, error_budget=None):
+    """
+    Resolve a list of hash values with as few requests as possible.
+
+    The hash values are sent to the service in chunks of `batch_size`;
+     if the server doesn't support bulk lookups (or a chunk fails) the hashes
+     are requested individually instead, `HASHDB_FALLBACK_WORKERS` at a time.
+
+    The optional `progress_callback(resolved, total)` is invoked after every
+     request; if it returns False the remaining requests are skipped.
+
+    Failed requests (after retries) don't abort the lookup until more than
+     `error_budget` of them failed, the partial results are returned either way.
+
+    Returns a dictionary mapping each (unxored) hash value to its list of hashes,
+     values which couldn't be resolved because of errors are missing.
+    """
+    # Handle an empty timeout, batch size and error budget
+    global HASHDB_BULK_UNSUPPORTED
+    if timeout is None:
+        timeout = config.HASHDB_REQUEST_TIMEOUT
+    if not batch_size:
+        batch_size = config.HASHDB_BATCH_SIZE
+    if error_budget is None:
+        error_budget = config.HASHDB_ERROR_BUDGET
+
+    results = {}
+    unique_values = list(dict.fromkeys(hash_values))
+    total = len(unique_values)
+    def report_progress() -> bool:
+        return progress_callback is None or progress_callback(len(results), total) is not False
+
+    errors = 0
+    def record_error(exception: Exception) -> bool:
+        """Returns False once the error budget is exhausted."""
+        nonlocal errors
+        errors += 1
+        if errors > error_budget:
+            # Only the first failure past the budget is reported
+            if errors == error_budget + 1:
+                logging.warning("Hash lookup request to {} failed: {}".format(api_url, exception))
+                logging.warning("Error budget exhausted, {} of {} hashes are unresolved".format(total - len(results), total))
+            return False
+        logging.warning("Hash lookup request to {} failed ({}/{}): {}".format(api_url, errors, error_budget, exception))
+        return True
+
+    # Resolve what we can with the local engine and index
+    index = get_hash_index(algorithm)
+    for hash_value in unique_values:
+        local_hashes = get_local_strings_from_hash(algorithm, hash_value ^ xor_value)
+        if not local_hashes and index is not None:
+            local_hashes = index.lookup(hash_value ^ xor_value)
+        if local_hashes or config.HASHDB_OFFLINE:
+            results[hash_value] = local_hashes or []
+    unique_values = [hash_value for hash_value in unique_values if hash_value not in results]
+
+    # Serve what we can from the local cache
+    cache = get_cache()
+    if cache is not None:
+        for hash_value in unique_values:
+            hashes = cache.get(api_url, algorithm, hash_value ^ xor_value)
+            if hashes is not None:
+                results[hash_value] = hashes
+        unique_values = [hash_value for hash_value in unique_values if hash_value not in results]
+
+    if unique_values and api_url not in HASHDB_BULK_UNSUPPORTED:
+        bulk_url = api_url + '/hash/%s' % algorithm
+        for index in range(0, len(unique_values), batch_size):
+            chunk = unique_values[index:index + batch_size]
+            chunk_results = {hash_value: [] for hash_value in chunk}
+            try:
+                with send_request("POST", bulk_url, json={"hashes": [hash_value ^ xor_value for hash_value in chunk]},
+                                  timeout=timeout, stream=True) as r:
+                    # The server rejects bulk lookups (any client error besides rate limiting,
+                    #  which was retried already), fall back to single requests right away
+                    if (400 <= r.status_code < 500 and r.status_code not in RETRY_STATUS_CODES) or r.status_code == 501:
+                        logging.debug("Bulk hash lookups are not supported by {}, status {}".format(api_url, r.status_code))
+                        HASHDB_BULK_UNSUPPORTED.add(api_url)
+                        break
+                    if not r.ok:
+                        raise HashDBError("Get hashes API request failed, status %s" % r.status_code)
+
+                    # Fan the results back out to the requested values as they arrive
+                    for hash_info in iter_json_array(r, 'hashes'):
+                        hash_value = hash_info.get('hash', None)
+                        if hash_value is None:
+                            continue
+                        chunk_results.setdefault(hash_value ^ xor_value, []).extend(clean_hash_results([hash_info]))
+            except (requests.RequestException, HashDBError) as exception:
+                # The hashes of a failed chunk are requested individually below
+                if not record_error(exception):
+                    return results
+                continue
+            results.update(chunk_results)
+            if cache is not None:
+                for hash_value in chunk:
+                    cache.put(api_url, algorithm, hash_value ^ xor_value, results[hash_value])
+            if not report_progress():
+                return results
+
+    # Fallback: one request per (remaining) hash value, sent concurrently
+    unique_values = [hash_value for hash_value in unique_values if hash_value not in results]
+    if not unique_values:
+        return results
+    workers = max(1, min(config.HASHDB_FALLBACK_WORKERS, len(unique_values)))
+    stop_event = threading.Event()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(get_strings_from_hash, algorithm, hash_value, xor_value, api_url, timeout, stop_event): hash_value
+                   for hash_value in unique_values}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    results[futures[future]] = future.result().get('hashes', [])
+                except (requests.RequestException, HashDBError) as exception:
+                    if not record_error(exception):
+                        break
+                if not report_progress():
+                    break
+        finally:
+            # Don't send the remaining requests if we stopped early, and
+            #  stop retrying the requests in flight
+            stop_event.set()
+            for future in futures:
+                future.cancel()
+    return results
+
+
+def get_module_hashes(module_name, algorithm, permutation, api_url='https://hashdb.openanalysis.net', timeout=None):
+    # Handle an empty timeout
+    if timeout is None:
+        timeout = config.HASHDB_REQUEST_TIMEOUT
+
+    # Offline mode can only hash the modules of the local corpus
+    if config.HASHDB_OFFLINE:
+        return {'hashes':get_local_module_hashes(module_name, algorithm) or []}
+
+    return {'hashes':list(iter_module_hashes(module_name, algorithm, permutation, api_url, timeout))}
+
+
+def iter_module_hashes(module_name, algorithm, permutation, api_url='https://hashdb.openanalysis.net', timeout=None):
+    """
+    Generator variant of `get_module_hashes`, the response is parsed
+     incrementally and every hash entry is yielded as soon as it arrives.
+    """
+    # Handle an empty timeout
+    if timeout is None:
+        timeout = config.HASHDB_REQUEST_TIMEOUT
+
+    # Offline mode can only hash the modules of the local corpus
+    if config.HASHDB_OFFLINE:
+        yield from get_local_module_hashes(module_name, algorithm) or []
+        return
+
+    cache = get_cache()
+    if cache is not None:
+        results = cache.iter_module(api_url, module_name, algorithm, permutation)
+        if results is not None:
+            yield from results
+            return
+    
+    module_url = api_url + '/module/%s/%s/%s' % (module_name, algorithm, permutation)
+    with send_request("GET", module_url, timeout=timeout, stream=True) as r:
+        if not r.ok:
+            raise HashDBError("Get hash API request failed, status %s" % r.status_code)
+        # The entries are cached in chunks as they arrive, so only one chunk is kept in memory
+        chunk = []
+        chunk_index = 0
+        if cache is not None:
+            cache.begin_module(api_url, module_name, algorithm, permutation)
+        for hash_entry in iter_json_array(r, 'hashes'):
+            if cache is not None:
+                chunk.append(hash_entry)
+                if len(chunk) >= cache.MODULE_CHUNK_SIZE:
+                    cache.put_module_chunk(api_url, module_name, algorithm, permutation, chunk_index, chunk)
+                    chunk = []
+                    chunk_index += 1
+            yield hash_entry
+    if cache is not None:
+        if chunk:
+            cache.put_module_chunk(api_url, module_name, algorithm, permutation, chunk_index, chunk)
+        cache.finish_module(api_url, module_name, algorithm, permutation)
+
+
+def iter_json_array(response, key: str, chunk_size: int = 64 * 1024):
+    """
+    Incrementally parse a streamed JSON response, yielding the items of
+     the array stored under `key` in the top level object one at a time.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = response.iter_content(chunk_size=chunk_size)
+    buffer = ""
+
+    # Find the start of the array
+    marker = '"%s"' % key
+    position = -1
+    while position == -1:
+        chunk = next(chunks, None)
+        if chunk is None:
+            return # The key doesn't exist
+        buffer += text_decoder.decode(chunk)
+        key_position = buffer.find(marker)
+        if key_position != -1:
+            position = buffer.find('[', key_position + len(marker))
+    position += 1
+
+    # Decode the items one by one, reading more data when an item is incomplete.
+    #  An item is only complete once it's followed by a separator, a number cut
+    #  off at the end of a chunk (e.g. `123` of `12345`) decodes without errors.
+    #  Malformed items are read until the response ends and raise an error
+    WHITESPACE = " \t\r\n,"
+    while True:
+        while position < len(buffer) and buffer[position] in WHITESPACE:
+            position += 1
+        if position < len(buffer):
+            if buffer[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+                while end < len(buffer) and buffer[end] in " \t\r\n":
+                    end += 1
+                if end < len(buffer) and buffer[end] in ",]":
+                    position = end
+                    yield item
+                    continue
+            except ValueError:
+                pass # Incomplete item
+
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise HashDBError("Incomplete JSON response, the array \"%s\" isn't terminated" % key)
+        # Drop the consumed data
+        buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
+
+
+def hunt_hash(hash_value, api_url='https://hashdb.openanalysis.net', timeout = None):
+    """
+    Returns the algorithms which produce a hash value, or (if a list of hash
+     values is provided) any of the hash values, best match first.
+    """
+    hash_values = hash_value if isinstance(hash_value, (list, tuple, set)) else [hash_value]
+    return [algorithm for algorithm, _ in hunt_hashes(hash_values, api_url, timeout)]
+
+
+def hunt_hashes(hash_values, api_url='https://hashdb.openanalysis.net', timeout = None) -> list:
+    """
+    Hunt the algorithm of multiple hash values with a single request.
+
+    Returns a list of (algorithm, hits) tuples ordered by hits, the hits being
+     the number of (unique) hash values the algorithm produces.
+    """
+    # Handle an empty timeout
+    if timeout is None:
+        timeout = config.HASHDB_REQUEST_TIMEOUT
+
+    if config.HASHDB_OFFLINE:
+        return hunt_local_hashes(hash_values)
+
+    hash_list = list(dict.fromkeys(hash_values))
+    module_url = api_url + '/hunt'
+    r = send_request("POST", module_url, json={"hashes": hash_list}, timeout=timeout)
+    if not r.ok:
+        logging.debug("Hunt request to {} failed: {}".format(module_url, r.text))
+        raise HashDBError("Get hash API request failed, status %s" % r.status_code)
+
+    # The service returns one hit per algorithm with the number (`count`) or
+    #  fraction (`hitrate`) of matched hashes, per hash hits are counted once
+    counts = {}
+    hashes = {}
+    for hit in r.json().get('hits',[]):
+        algo = hit.get('algorithm',None)
+        if algo == None:
+            continue
+        if hit.get('count', None) is not None:
+            counts[algo] = max(counts.get(algo, 0), int(hit['count']))
+        elif hit.get('hitrate', None) is not None:
+            counts[algo] = max(counts.get(algo, 0), int(round(float(hit['hitrate']) * len(hash_list))))
+        else:
+            hashes.setdefault(algo, set()).add(hit.get('hash', None))
+            counts[algo] = max(counts.get(algo, 0), len(hashes[algo]))
+
+    # Keep the order of the response for ties
+    ranked = [(algo, hits) for algo, hits in counts.items() if hits]
+    ranked.sort(key=lambda match: -match[1])
+    return ranked
+
+
+def determine_algorithm_size(algorithm_type: str) -> str:
+    size = 'Unknown'
+    if algorithm_type is None:
+        return size
+    
+    if algorithm_type == 'unsigned_int':
+        size = '32'
+    elif algorithm_type == 'unsigned_long':
+        size = '64'
+    return size
+
+
+def build_hash_index(algorithm: str, module_names: list, permutation: str,
+                     api_url: str = 'https://hashdb.openanalysis.net', timeout=None) -> int:
+    """
+    Build the index file for an algorithm from the module hash lists
+     returned by the API (see `get_module_hashes`), e.g.:
+        build_hash_index("ror13_add", ["kernel32", "ntdll"], "api")
+
+    Returns the number of indexed hashes.
+    """
+    size = 0
+    entries = []
+    for module_name in module_names:
+        for hash_entry in get_module_hashes(module_name, algorithm, permutation, api_url, timeout).get("hashes", []):
+            hash_value = hash_entry.get("hash", 0)
+            size = max(size, 8 if hash_value > 0xFFFFFFFF else 4)
+            entries.append((hash_value, hash_entry.get("string", {})))
+
+    # Drop the index we have open (if any) before replacing it
+    close_hash_index(algorithm)
+
+    path = os.path.join(get_index_directory(), algorithm + ".hdbi")
+    count = HashIndex.write(path, size or 4, entries)
+    logging.info("HashDB: Indexed {} hashes for {} in {}".format(count, algorithm, path))
+    return count
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Settings shared by the HashDB core modules.
+
+The values are read whenever they are used, so they can be changed at any
+ time with `configure`, e.g. `configure(offline=True, request_timeout=5)`.
+"""
+import os
+
+VERSION = '1.8.0'
+
+HASHDB_API_URL = "https://hashdb.openanalysis.net"
+HASHDB_REQUEST_TIMEOUT = 15 # Limit to 15 seconds
+HASHDB_USER_AGENT = "HashDB/{}".format(VERSION)
+
+# Directory for the cache, indexes, algorithm catalog and user corpus
+HASHDB_DATA_DIRECTORY = os.path.join(os.path.expanduser("~"), ".hashdb")
+
+# Variables for bulk operations
+HASHDB_BATCH_SIZE = 100 # Hashes per bulk lookup request
+HASHDB_FALLBACK_WORKERS = 16 # Concurrent single lookups if bulk lookups aren't supported
+
+# Variables for the shared HTTP session
+HASHDB_POOL_CONNECTIONS = 4 # Number of hosts to keep a connection pool for
+HASHDB_POOL_MAXSIZE = 16 # Maximum number of kept-alive connections per host
+
+# Variables for retrying transient failures (5xx, 429, connection errors)
+HASHDB_RETRIES = 3 # Retries per request, 0 disables retrying
+HASHDB_RETRY_BACKOFF = 0.5 # Base delay in seconds, doubled for every retry
+HASHDB_RETRY_MAX_BACKOFF = 30 # Upper limit of a single delay (including Retry-After)
+HASHDB_ERROR_BUDGET = 10 # Failed requests tolerated per bulk lookup before giving up
+
+# Variables for the client side rate limiter (shared by all requests)
+HASHDB_RATE_LIMIT = 0 # Requests per second (fractions allowed), 0 disables the limit
+HASHDB_RATE_BURST = 10 # Requests which may be sent at once after an idle period
+HASHDB_MAX_IN_FLIGHT = 16 # Concurrent requests, 0 disables the limit
+
+# Variables for the local result cache
+HASHDB_USE_CACHE = True
+HASHDB_CACHE_TTL = 30 * 24 * 60 * 60 # Keep results for 30 days
+HASHDB_CACHE_NEGATIVE_TTL = 24 * 60 * 60 # Keep misses for 1 day
+HASHDB_CACHE_MAX_ENTRIES = 500000
+
+# Only use the local hashing engine, never contact the API
+HASHDB_OFFLINE = False
+
+# Refresh the algorithm catalog daily
+HASHDB_ALGORITHM_CATALOG_TTL = 24 * 60 * 60
+
+
+def configure(**settings):
+    """
+    Change settings by their lowercase name without the `HASHDB_` prefix.
+    """
+    for name, value in settings.items():
+        setting = "HASHDB_" + name.upper()
+        if setting not in globals():
+            raise ValueError("Unknown HashDB setting: {}".format(name))
+        globals()[setting] = value
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""
+HashDB exceptions.
+"""
+
+
+class HashDBError(Exception):
+    pass
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Memory-mapped index files of precomputed hashes.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import Union
+
+from . import config
+from .errors import HashDBError
+
+# Opened hash index files (algorithm -> HashIndex or None)
+HASHDB_INDEXES = {}
+HASHDB_INDEXES_LOCK = threading.Lock()
+
+
+class HashIndex:
+    """
+    Read-only, memory-mapped index of precomputed hashes for one algorithm.
+
+    File layout (little endian):
+      header:  magic (4s), version (H), hash size in bytes (H), record count (I), blob offset (Q)
+      records: [hash (I or Q), blob offset (I)] sorted by hash
+      blob:    [length (I), json encoded string object] for each record, at most 4 GiB
+    """
+    MAGIC = b"HDBI"
+    VERSION = 2
+    HEADER = struct.Struct("<4sHHIQ")
+    RECORD_FORMATS = {4: struct.Struct("<II"), 8: struct.Struct("<QI")}
+    LENGTH = struct.Struct("<I")
+    MAX_BLOB_SIZE = 0xFFFFFFFF # Blob offsets are 32 bit
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as index_file:
+            self.mapping = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.hash_size, self.count, self.blob_offset = self.HEADER.unpack_from(self.mapping, 0)
+        if magic != self.MAGIC or self.hash_size not in self.RECORD_FORMATS:
+            self.mapping.close()
+            raise HashDBError("Invalid hash index file: {}".format(path))
+        if version != self.VERSION:
+            self.mapping.close()
+            raise HashDBError("Unsupported hash index version {} (expected {}), rebuild {}".format(version, self.VERSION, path))
+        self.record = self.RECORD_FORMATS[self.hash_size]
+
+    def _record(self, index: int) -> tuple:
+        return self.record.unpack_from(self.mapping, self.HEADER.size + index * self.record.size)
+
+    def lookup(self, hash_value: int) -> list:
+        """
+        Binary search the index, returns the hashes matching the value.
+        """
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._record(middle)[0] < hash_value:
+                low = middle + 1
+            else:
+                high = middle
+
+        hashes = []
+        for index in range(low, self.count):
+            record_hash, string_offset = self._record(index)
+            if record_hash != hash_value:
+                break
+            offset = self.blob_offset + string_offset
+            length = self.LENGTH.unpack_from(self.mapping, offset)[0]
+            string_object = json.loads(self.mapping[offset + self.LENGTH.size:offset + self.LENGTH.size + length].decode())
+            hashes.append({"hash": hash_value, "string": string_object})
+        return hashes
+
+    def close(self):
+        self.mapping.close()
+
+    @staticmethod
+    def write(path: str, hash_size: int, entries) -> int:
+        """
+        Write an index file from an iterable of (hash value, string object) tuples.
+         Returns the number of records written.
+
+        Raises a HashDBError if the strings don't fit the 4 GiB blob.
+        """
+        record = HashIndex.RECORD_FORMATS[hash_size]
+        blob = bytearray()
+        records = []
+        for hash_value, string_object in entries:
+            encoded = json.dumps(string_object, separators=(",", ":")).encode()
+            if len(blob) + HashIndex.LENGTH.size + len(encoded) > HashIndex.MAX_BLOB_SIZE:
+                raise HashDBError("Hash index {} exceeds the maximum blob size of 4 GiB".format(path))
+            records.append((hash_value, len(blob)))
+            blob += HashIndex.LENGTH.pack(len(encoded)) + encoded
+        records.sort()
+
+        blob_offset = HashIndex.HEADER.size + len(records) * record.size
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "wb") as index_file:
+            index_file.write(HashIndex.HEADER.pack(HashIndex.MAGIC, HashIndex.VERSION, hash_size, len(records), blob_offset))
+            for hash_value, string_offset in records:
+                index_file.write(record.pack(hash_value, string_offset))
+            index_file.write(blob)
+        return len(records)
+
+
+def get_index_directory() -> str:
+    return os.path.join(config.HASHDB_DATA_DIRECTORY, "index")
+
+
+def get_hash_index(algorithm: str) -> Union[None, HashIndex]:
+    """
+    Return the (opened) index for an algorithm, or None if there isn't one.
+    """
+    global HASHDB_INDEXES, HASHDB_INDEXES_LOCK
+    with HASHDB_INDEXES_LOCK:
+        if algorithm not in HASHDB_INDEXES:
+            index = None
+            path = os.path.join(get_index_directory(), algorithm + ".hdbi")
+            if os.path.isfile(path):
+                try:
+                    index = HashIndex(path)
+                except (OSError, ValueError, struct.error, HashDBError) as exception:
+                    logging.error("HashDB failed to open the hash index {}: {}".format(path, exception))
+            HASHDB_INDEXES[algorithm] = index
+        return HASHDB_INDEXES[algorithm]
+
+
+def close_hash_indexes():
+    global HASHDB_INDEXES, HASHDB_INDEXES_LOCK
+    with HASHDB_INDEXES_LOCK:
+        for index in HASHDB_INDEXES.values():
+            if index is not None:
+                index.close()
+        HASHDB_INDEXES = {}
+
+
+def close_hash_index(algorithm: str):
+    """
+    Close the index of an algorithm (if it's open), e.g. before replacing it.
+    """
+    global HASHDB_INDEXES, HASHDB_INDEXES_LOCK
+    with HASHDB_INDEXES_LOCK:
+        index = HASHDB_INDEXES.pop(algorithm, None)
+        if index is not None:
+            index.close()
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+Local hashing engine, resolves hashes of common Windows exports without the API.
+"""
+import collections
+import json
+import logging
+import os
+import threading
+import zlib
+from typing import Callable, Union
+
+from . import config
+
+
+def ror32(value: int, count: int) -> int:
+    return ((value >> count) | (value << (32 - count))) & 0xFFFFFFFF
+
+
+def hash_crc32(data: bytes) -> int:
+    return zlib.crc32(data) & 0xFFFFFFFF
+
+
+def hash_djb2(data: bytes) -> int:
+    hash_value = 5381
+    for character in data:
+        hash_value = ((hash_value * 33) + character) & 0xFFFFFFFF
+    return hash_value
+
+
+def hash_sdbm(data: bytes) -> int:
+    hash_value = 0
+    for character in data:
+        hash_value = (character + (hash_value << 6) + (hash_value << 16) - hash_value) & 0xFFFFFFFF
+    return hash_value
+
+
+def hash_fnv1_32(data: bytes) -> int:
+    hash_value = 0x811C9DC5
+    for character in data:
+        hash_value = ((hash_value * 0x01000193) & 0xFFFFFFFF) ^ character
+    return hash_value
+
+
+def hash_fnv1a_32(data: bytes) -> int:
+    hash_value = 0x811C9DC5
+    for character in data:
+        hash_value = ((hash_value ^ character) * 0x01000193) & 0xFFFFFFFF
+    return hash_value
+
+
+def hash_fnv1_64(data: bytes) -> int:
+    hash_value = 0xCBF29CE484222325
+    for character in data:
+        hash_value = ((hash_value * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF) ^ character
+    return hash_value
+
+
+def hash_fnv1a_64(data: bytes) -> int:
+    hash_value = 0xCBF29CE484222325
+    for character in data:
+        hash_value = ((hash_value ^ character) * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+    return hash_value
+
+
+def hash_ror13_add(data: bytes) -> int:
+    hash_value = 0
+    for character in data:
+        hash_value = (ror32(hash_value, 13) + character) & 0xFFFFFFFF
+    return hash_value
+
+
+# Algorithm name (as used by the HashDB service) -> [hash function, size in bits]
+LOCAL_ALGORITHMS = {
+    "crc32": [hash_crc32, 32],
+    "djb2": [hash_djb2, 32],
+    "sdbm": [hash_sdbm, 32],
+    "fnv1_32": [hash_fnv1_32, 32],
+    "fnv1a_32": [hash_fnv1a_32, 32],
+    "fnv1_64": [hash_fnv1_64, 64],
+    "fnv1a_64": [hash_fnv1a_64, 64],
+    "ror13_add": [hash_ror13_add, 32],
+}
+
+# Bundled corpus of commonly hashed Windows exports (module -> export names).
+#  Additional modules/exports can be provided in `<IDA user dir>/hashdb/corpus.json`
+#  using the same layout.
+LOCAL_CORPUS = {
+    "kernel32": [
+        "LoadLibraryA", "LoadLibraryW", "LoadLibraryExA", "LoadLibraryExW", "GetProcAddress",
+        "GetModuleHandleA", "GetModuleHandleW", "GetModuleFileNameA", "GetModuleFileNameW", "FreeLibrary",
+        "VirtualAlloc", "VirtualAllocEx", "VirtualFree", "VirtualProtect", "VirtualProtectEx", "VirtualQuery",
+        "HeapAlloc", "HeapFree", "HeapCreate", "GetProcessHeap", "LocalAlloc", "LocalFree", "GlobalAlloc", "GlobalFree",
+        "CreateFileA", "CreateFileW", "ReadFile", "WriteFile", "CloseHandle", "DeleteFileA", "DeleteFileW",
+        "GetFileSize", "GetFileSizeEx", "SetFilePointer", "SetFilePointerEx", "MoveFileA", "MoveFileW",
+        "MoveFileExW", "CopyFileA", "CopyFileW", "FindFirstFileA", "FindFirstFileW", "FindNextFileA",
+        "FindNextFileW", "FindClose", "GetFileAttributesA", "GetFileAttributesW", "SetFileAttributesW",
+        "CreateDirectoryA", "CreateDirectoryW", "RemoveDirectoryW", "GetTempPathA", "GetTempPathW",
+        "GetTempFileNameW", "GetLogicalDrives", "GetDriveTypeA", "GetDriveTypeW", "GetLogicalDriveStringsW",
+        "CreateProcessA", "CreateProcessW", "OpenProcess", "TerminateProcess", "ExitProcess", "GetCurrentProcess",
+        "GetCurrentProcessId", "CreateThread", "CreateRemoteThread", "OpenThread", "ResumeThread",
+        "SuspendThread", "ExitThread", "GetCurrentThread", "GetCurrentThreadId", "GetThreadContext",
+        "SetThreadContext", "WriteProcessMemory", "ReadProcessMemory", "CreateToolhelp32Snapshot",
+        "Process32First", "Process32FirstW", "Process32Next", "Process32NextW", "Module32First", "Module32Next",
+        "Thread32First", "Thread32Next", "WaitForSingleObject", "WaitForMultipleObjects", "Sleep", "SleepEx",
+        "CreateMutexA", "CreateMutexW", "OpenMutexA", "OpenMutexW", "ReleaseMutex", "CreateEventA",
+        "CreateEventW", "SetEvent", "ResetEvent", "GetLastError", "SetLastError", "GetTickCount",
+        "GetTickCount64", "QueryPerformanceCounter", "GetSystemTime", "GetLocalTime", "GetSystemTimeAsFileTime",
+        "GetSystemInfo", "GetNativeSystemInfo", "GetVersionExA", "GetVersionExW", "GetComputerNameA",
+        "GetComputerNameW", "GetWindowsDirectoryA", "GetWindowsDirectoryW", "GetSystemDirectoryA",
+        "GetSystemDirectoryW", "GetEnvironmentVariableA", "GetEnvironmentVariableW",
+        "ExpandEnvironmentStringsA", "ExpandEnvironmentStringsW", "GetCommandLineA", "GetCommandLineW",
+        "IsDebuggerPresent", "CheckRemoteDebuggerPresent", "OutputDebugStringA", "OutputDebugStringW",
+        "CreatePipe", "PeekNamedPipe", "ConnectNamedPipe", "CreateNamedPipeA", "CreateNamedPipeW",
+        "DeviceIoControl", "CreateFileMappingA", "CreateFileMappingW", "MapViewOfFile", "UnmapViewOfFile",
+        "FlushInstructionCache", "IsWow64Process", "WinExec", "lstrlenA", "lstrlenW", "lstrcpyA", "lstrcpyW",
+        "lstrcatA", "lstrcatW", "lstrcmpA", "lstrcmpW", "lstrcmpiA", "lstrcmpiW", "MultiByteToWideChar",
+        "WideCharToMultiByte", "GetVolumeInformationA", "GetVolumeInformationW", "GetDiskFreeSpaceExW",
+        "SetErrorMode", "SetUnhandledExceptionFilter", "AddVectoredExceptionHandler", "TlsAlloc",
+        "TlsGetValue", "TlsSetValue", "InitializeCriticalSection", "EnterCriticalSection",
+        "LeaveCriticalSection", "DeleteCriticalSection", "DuplicateHandle", "GetExitCodeProcess",
+        "GetExitCodeThread", "QueueUserAPC", "FindResourceA", "FindResourceW", "LoadResource",
+        "LockResource", "SizeofResource", "GetStartupInfoA", "GetStartupInfoW", "SetCurrentDirectoryW",
+        "GetCurrentDirectoryW", "GetUserDefaultLangID", "GetUserDefaultUILanguage", "GetLocaleInfoW",
+    ],
+    "ntdll": [
+        "NtAllocateVirtualMemory", "NtFreeVirtualMemory", "NtProtectVirtualMemory", "NtReadVirtualMemory",
+        "NtWriteVirtualMemory", "NtQueryVirtualMemory", "NtCreateSection", "NtMapViewOfSection",
+        "NtUnmapViewOfSection", "NtCreateThreadEx", "NtOpenProcess", "NtOpenThread", "NtClose",
+        "NtQueryInformationProcess", "NtSetInformationProcess", "NtQueryInformationThread",
+        "NtSetInformationThread", "NtQuerySystemInformation", "NtResumeThread", "NtSuspendThread",
+        "NtTerminateProcess", "NtTerminateThread", "NtGetContextThread", "NtSetContextThread",
+        "NtQueueApcThread", "NtDelayExecution", "NtCreateFile", "NtOpenFile", "NtReadFile", "NtWriteFile",
+        "NtDeleteFile", "NtQueryDirectoryFile", "NtQueryInformationFile", "NtSetInformationFile",
+        "NtDeviceIoControlFile", "NtCreateKey", "NtOpenKey", "NtSetValueKey", "NtQueryValueKey",
+        "NtDeleteKey", "NtWaitForSingleObject", "NtCreateMutant", "NtCreateEvent", "NtFlushInstructionCache",
+        "NtTestAlert", "NtContinue", "NtRaiseHardError", "NtShutdownSystem", "LdrLoadDll", "LdrGetProcedureAddress",
+        "LdrGetDllHandle", "LdrUnloadDll", "RtlInitUnicodeString", "RtlInitAnsiString", "RtlAnsiStringToUnicodeString",
+        "RtlUnicodeStringToAnsiString", "RtlFreeUnicodeString", "RtlAllocateHeap", "RtlFreeHeap",
+        "RtlCreateHeap", "RtlMoveMemory", "RtlCopyMemory", "RtlZeroMemory", "RtlFillMemory", "RtlCompareMemory",
+        "RtlGetVersion", "RtlAdjustPrivilege", "RtlDecompressBuffer", "RtlCompressBuffer",
+        "RtlGetCompressionWorkSpaceSize", "RtlCreateUserThread", "RtlExitUserThread", "RtlSetProcessIsCritical",
+        "RtlGetLastWin32Error", "RtlNtStatusToDosError", "RtlRandomEx", "ZwAllocateVirtualMemory",
+        "ZwProtectVirtualMemory", "ZwWriteVirtualMemory", "ZwMapViewOfSection", "ZwUnmapViewOfSection",
+        "ZwQuerySystemInformation", "ZwQueryInformationProcess", "ZwClose", "ZwCreateThreadEx",
+        "ZwResumeThread", "ZwDelayExecution", "memcpy", "memset", "memmove", "memcmp", "strlen", "wcslen",
+        "strcpy", "wcscpy", "strcat", "wcscat", "strcmp", "wcscmp", "_stricmp", "_wcsicmp", "sprintf", "swprintf",
+        "_snprintf", "_snwprintf",
+    ],
+    "advapi32": [
+        "RegOpenKeyA", "RegOpenKeyW", "RegOpenKeyExA", "RegOpenKeyExW", "RegCreateKeyA", "RegCreateKeyW",
+        "RegCreateKeyExA", "RegCreateKeyExW", "RegSetValueExA", "RegSetValueExW", "RegQueryValueExA",
+        "RegQueryValueExW", "RegDeleteKeyA", "RegDeleteKeyW", "RegDeleteValueA", "RegDeleteValueW",
+        "RegEnumKeyExA", "RegEnumKeyExW", "RegEnumValueA", "RegEnumValueW", "RegCloseKey",
+        "OpenProcessToken", "OpenThreadToken", "GetTokenInformation", "AdjustTokenPrivileges",
+        "LookupPrivilegeValueA", "LookupPrivilegeValueW", "DuplicateTokenEx", "ImpersonateLoggedOnUser",
+        "RevertToSelf", "GetUserNameA", "GetUserNameW", "AllocateAndInitializeSid", "FreeSid",
+        "CheckTokenMembership", "OpenSCManagerA", "OpenSCManagerW", "OpenServiceA", "OpenServiceW",
+        "CreateServiceA", "CreateServiceW", "StartServiceA", "StartServiceW", "ControlService",
+        "DeleteService", "CloseServiceHandle", "ChangeServiceConfigA", "ChangeServiceConfigW",
+        "QueryServiceStatus", "EnumServicesStatusExA", "EnumServicesStatusExW",
+        "StartServiceCtrlDispatcherA", "StartServiceCtrlDispatcherW", "RegisterServiceCtrlHandlerA",
+        "RegisterServiceCtrlHandlerW", "SetServiceStatus", "CryptAcquireContextA", "CryptAcquireContextW",
+        "CryptReleaseContext", "CryptCreateHash", "CryptHashData", "CryptDeriveKey", "CryptDestroyHash",
+        "CryptDestroyKey", "CryptEncrypt", "CryptDecrypt", "CryptGenKey", "CryptGenRandom", "CryptImportKey",
+        "CryptExportKey", "CryptGetHashParam", "CryptSetKeyParam", "CreateProcessAsUserA",
+        "CreateProcessAsUserW", "CreateProcessWithTokenW", "LogonUserA", "LogonUserW",
+    ],
+    "user32": [
+        "MessageBoxA", "MessageBoxW", "FindWindowA", "FindWindowW", "FindWindowExA", "FindWindowExW",
+        "GetForegroundWindow", "GetWindowTextA", "GetWindowTextW", "GetWindowThreadProcessId",
+        "ShowWindow", "SetWindowsHookExA", "SetWindowsHookExW", "UnhookWindowsHookEx", "CallNextHookEx",
+        "GetAsyncKeyState", "GetKeyState", "GetKeyboardState", "MapVirtualKeyA", "MapVirtualKeyW",
+        "GetMessageA", "GetMessageW", "PeekMessageA", "PeekMessageW", "TranslateMessage", "DispatchMessageA",
+        "DispatchMessageW", "PostMessageA", "PostMessageW", "SendMessageA", "SendMessageW",
+        "RegisterClassExA", "RegisterClassExW", "CreateWindowExA", "CreateWindowExW", "DestroyWindow",
+        "DefWindowProcA", "DefWindowProcW", "GetDC", "ReleaseDC", "GetDesktopWindow", "GetSystemMetrics",
+        "OpenClipboard", "CloseClipboard", "GetClipboardData", "SetClipboardData", "EmptyClipboard",
+        "wsprintfA", "wsprintfW", "wvsprintfA", "wvsprintfW", "CharUpperA", "CharUpperW", "CharLowerA",
+        "CharLowerW", "GetCursorPos", "SystemParametersInfoA", "SystemParametersInfoW", "ExitWindowsEx",
+    ],
+    "ws2_32": [
+        "WSAStartup", "WSACleanup", "WSAGetLastError", "WSASocketA", "WSASocketW", "WSAConnect", "WSASend",
+        "WSARecv", "WSAIoctl", "socket", "connect", "bind", "listen", "accept", "send", "recv", "sendto",
+        "recvfrom", "closesocket", "shutdown", "select", "ioctlsocket", "setsockopt", "getsockopt",
+        "gethostbyname", "gethostname", "getaddrinfo", "freeaddrinfo", "inet_addr", "inet_ntoa", "htons",
+        "htonl", "ntohs", "ntohl",
+    ],
+    "wininet": [
+        "InternetOpenA", "InternetOpenW", "InternetConnectA", "InternetConnectW", "InternetOpenUrlA",
+        "InternetOpenUrlW", "InternetReadFile", "InternetWriteFile", "InternetCloseHandle",
+        "InternetSetOptionA", "InternetSetOptionW", "InternetQueryOptionA", "InternetQueryOptionW",
+        "InternetCrackUrlA", "InternetCrackUrlW", "InternetGetConnectedState", "HttpOpenRequestA",
+        "HttpOpenRequestW", "HttpSendRequestA", "HttpSendRequestW", "HttpAddRequestHeadersA",
+        "HttpAddRequestHeadersW", "HttpQueryInfoA", "HttpQueryInfoW",
+    ],
+    "winhttp": [
+        "WinHttpOpen", "WinHttpConnect", "WinHttpOpenRequest", "WinHttpSendRequest", "WinHttpReceiveResponse",
+        "WinHttpQueryHeaders", "WinHttpQueryDataAvailable", "WinHttpReadData", "WinHttpWriteData",
+        "WinHttpCloseHandle", "WinHttpSetOption", "WinHttpSetTimeouts", "WinHttpCrackUrl",
+        "WinHttpGetIEProxyConfigForCurrentUser", "WinHttpGetProxyForUrl",
+    ],
+    "shell32": [
+        "ShellExecuteA", "ShellExecuteW", "ShellExecuteExA", "ShellExecuteExW", "SHGetFolderPathA",
+        "SHGetFolderPathW", "SHGetSpecialFolderPathA", "SHGetSpecialFolderPathW", "SHGetKnownFolderPath",
+        "SHFileOperationA", "SHFileOperationW", "SHCreateDirectoryExW", "CommandLineToArgvW", "IsUserAnAdmin",
+    ],
+    "ole32": [
+        "CoInitialize", "CoInitializeEx", "CoUninitialize", "CoCreateInstance", "CoInitializeSecurity",
+        "CoSetProxyBlanket", "CoTaskMemAlloc", "CoTaskMemFree", "CoCreateGuid", "CLSIDFromString",
+        "StringFromGUID2",
+    ],
+    "crypt32": [
+        "CryptStringToBinaryA", "CryptStringToBinaryW", "CryptBinaryToStringA", "CryptBinaryToStringW",
+        "CryptDecodeObjectEx", "CryptImportPublicKeyInfo", "CryptUnprotectData", "CryptProtectData",
+    ],
+    "bcrypt": [
+        "BCryptOpenAlgorithmProvider", "BCryptCloseAlgorithmProvider", "BCryptGenerateSymmetricKey",
+        "BCryptImportKeyPair", "BCryptEncrypt", "BCryptDecrypt", "BCryptDestroyKey", "BCryptGenRandom",
+        "BCryptSetProperty", "BCryptGetProperty", "BCryptCreateHash", "BCryptHashData", "BCryptFinishHash",
+        "BCryptDestroyHash",
+    ],
+    "psapi": [
+        "EnumProcesses", "EnumProcessModules", "GetModuleBaseNameA", "GetModuleBaseNameW",
+        "GetModuleFileNameExA", "GetModuleFileNameExW", "GetProcessImageFileNameA", "GetProcessImageFileNameW",
+    ],
+    "iphlpapi": [
+        "GetAdaptersInfo", "GetAdaptersAddresses", "GetIpNetTable", "GetExtendedTcpTable", "GetNetworkParams",
+    ],
+    "netapi32": [
+        "NetShareEnum", "NetServerEnum", "NetUserEnum", "NetLocalGroupGetMembers", "NetApiBufferFree",
+        "NetWkstaGetInfo",
+    ],
+    "mpr": [
+        "WNetOpenEnumA", "WNetOpenEnumW", "WNetEnumResourceA", "WNetEnumResourceW", "WNetCloseEnum",
+        "WNetAddConnection2A", "WNetAddConnection2W",
+    ],
+    "rstrtmgr": [
+        "RmStartSession", "RmRegisterResources", "RmGetList", "RmShutdown", "RmEndSession",
+    ],
+}
+
+# Lazily built hash tables: algorithm -> {hash value: {string: [modules]}}
+LOCAL_HASH_TABLES = {}
+LOCAL_HASH_TABLES_LOCK = threading.Lock()
+
+
+def load_local_corpus() -> dict:
+    """
+    Returns the bundled corpus merged with the user corpus (if one exists).
+    """
+    corpus = {module: list(exports) for module, exports in LOCAL_CORPUS.items()}
+    user_corpus_path = os.path.join(config.HASHDB_DATA_DIRECTORY, "corpus.json")
+    if os.path.isfile(user_corpus_path):
+        try:
+            with open(user_corpus_path, "r") as user_corpus_file:
+                for module, exports in json.load(user_corpus_file).items():
+                    corpus.setdefault(module.lower(), []).extend(exports)
+        except (OSError, ValueError, AttributeError) as exception:
+            logging.error("HashDB failed to load the user corpus {}: {}".format(user_corpus_path, exception))
+    return corpus
+
+
+def get_local_hash_table(algorithm: str) -> Union[None, dict]:
+    """
+    Returns the precomputed hash table for an algorithm, or None if
+     the algorithm isn't implemented locally.
+    """
+    global LOCAL_HASH_TABLES, LOCAL_HASH_TABLES_LOCK
+    if algorithm not in LOCAL_ALGORITHMS:
+        return None
+
+    with LOCAL_HASH_TABLES_LOCK:
+        table = LOCAL_HASH_TABLES.get(algorithm, None)
+        if table is None:
+            hash_function = LOCAL_ALGORITHMS[algorithm][0]
+            table = {}
+            for module, exports in load_local_corpus().items():
+                for export in exports:
+                    modules = table.setdefault(hash_function(export.encode()), {}).setdefault(export, [])
+                    if module not in modules:
+                        modules.append(module)
+            LOCAL_HASH_TABLES[algorithm] = table
+    return table
+
+
+def get_local_strings_from_hash(algorithm: str, hash_value: int) -> Union[None, list]:
+    """
+    Resolve a (xored) hash value using the local engine. The results use
+     the same layout as the HashDB API.
+
+    Returns None if the algorithm isn't implemented locally.
+    """
+    table = get_local_hash_table(algorithm)
+    if table is None:
+        return None
+
+    hashes = []
+    for export, modules in table.get(hash_value, {}).items():
+        hashes.append({"hash": hash_value,
+                       "string": {"string": export,
+                                  "is_api": True,
+                                  "permutation": "api",
+                                  "api": export,
+                                  "modules": modules}})
+    return hashes
+
+
+def get_local_module_hashes(module_name: str, algorithm: str) -> Union[None, list]:
+    """
+    Hash all of the exports of a module in the local corpus.
+
+    Returns None if the algorithm or module isn't available locally.
+    """
+    if algorithm not in LOCAL_ALGORITHMS:
+        return None
+    exports = load_local_corpus().get(module_name.lower(), None)
+    if exports is None:
+        return None
+
+    hash_function = LOCAL_ALGORITHMS[algorithm][0]
+    return [{"hash": hash_function(export.encode()),
+             "string": {"string": export, "is_api": True, "permutation": "api", "api": export, "modules": [module_name]}}
+            for export in exports]
+
+
+def hunt_local(hash_value: int) -> list:
+    """
+    Returns the locally implemented algorithms which produce the hash value.
+    """
+    return [algorithm for algorithm, _ in hunt_local_hashes([hash_value])]
+
+
+def hunt_local_hashes(hash_values, xor_value: int = 0) -> list:
+    """
+    Identify the algorithm of a set of hash values by hashing the corpus with
+     every locally implemented algorithm; the more of the (unxored) values an
+     algorithm produces, the more likely it is the right one.
+
+    Returns a list of (algorithm, hits) tuples ordered by hits, algorithms
+     without any hits are left out.
+    """
+    unique_values = {hash_value ^ xor_value for hash_value in hash_values}
+    matches = []
+    for algorithm in LOCAL_ALGORITHMS:
+        hits = len(get_local_hash_table(algorithm).keys() & unique_values)
+        if hits:
+            matches.append((algorithm, hits))
+    matches.sort(key=lambda match: (-match[1], match[0]))
+    return matches
+
+
+def solve_xor_key(hash_values, algorithm: str = None, min_hits: int = 3, max_keys: int = 5,
+                  progress_callback: Callable = None) -> list:
+    """
+    Derive the xor key of a set of (xored) hash values: every hash value is
+     xored with every locally computed hash, the keys that map the most hash
+     values into the local hash table are the likely xor keys.
+     If no algorithm is provided every locally implemented algorithm is tried.
+
+    Returns up to `max_keys` (algorithm, xor key, hits) tuples per algorithm
+     ordered by hits, keys with less than `min_hits` hits are left out.
+     A key of 0 means the hash values aren't xored.
+
+    Note: any two correctly keyed values `a ^ key` and `b ^ key` also map
+     into the table with the key `key ^ a ^ b` (swapped), a key needs at
+     least 3 hits to be meaningful.
+
+    The optional `progress_callback(done, total)` is invoked after every
+     algorithm; if it returns False the solutions found so far are returned.
+    """
+    algorithms = [algorithm] if algorithm is not None else list(LOCAL_ALGORITHMS)
+    unique_values = set(hash_values)
+    solutions = []
+    for done, algorithm in enumerate(algorithms, 1):
+        table = get_local_hash_table(algorithm)
+        if table is not None:
+            # Each (value, hash) pair proposes one key, the values are unique so the
+            #  count of a key is the number of values it maps into the table
+            keys = collections.Counter(value ^ local_hash for value in unique_values for local_hash in table)
+            solutions.extend((algorithm, key, hits) for key, hits in keys.most_common(max_keys) if hits >= min_hits)
+        if progress_callback is not None and progress_callback(done, len(algorithms)) is False:
+            break
+    solutions.sort(key=lambda solution: (-solution[2], solution[0], solution[1]))
+    return solutions
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Shaping and selection of lookup results.
+"""
+from typing import Union
+
+# How collisions (several strings for one hash) are resolved without the user
+COLLISION_POLICIES = ["first", "api", "skip"]
+
+
+def clean_hash_results(hashes: list) -> list:
+    """Remove null bytes from non-api strings."""
+    out_hashes = []
+    for hash_info in hashes:
+        if not hash_info.get('string',{}).get('is_api',True):
+            hash_info['string']['string'] = hash_info['string']['string'].replace('\x00','')
+        out_hashes.append(hash_info)
+    return out_hashes
+
+
+def get_hash_string_value(string_object: dict) -> str:
+    """
+    Returns the name of a string object, API hashes use the API name.
+    """
+    if string_object.get("is_api", False):
+        string_value = string_object.get("api", "")
+    else:
+        string_value = string_object.get("string", "")
+    # Handle empty string values
+    return string_value if len(string_value) else "empty_string"
+
+
+def resolve_collision(hashes: list, policy: str) -> Union[None, dict]:
+    """
+    Returns the string object selected from a lookup result by a
+     collision policy (see `COLLISION_POLICIES`), or None if it's skipped.
+    """
+    if not hashes:
+        return None
+    if len(hashes) == 1:
+        return hashes[0].get("string", {})
+    if policy == "api":
+        for entry in hashes:
+            if entry.get("string", {}).get("is_api", False):
+                return entry.get("string", {})
+    if policy in ("first", "api"):
+        return hashes[0].get("string", {})
+    return None
+
+
+def is_sentinel_hash(hash_value: int, size: int) -> bool:
+    """
+    Padding and sentinel values (all bits clear or set) are never hashes,
+     `size` is the size of the value in bits.
+    """
+    return hash_value in (0, (1 << size) - 1)
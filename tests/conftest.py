@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Shared fixtures: an isolated core configuration and a local mock HashDB server.
+"""
+import os
+import sys
+
+import pytest
+
+# The core library and the benchmarks aren't installed, import them from the checkout
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_server import MockHashDBServer
+from hashdb_core import client, config, close_cache, close_hash_indexes, close_session
+
+
+@pytest.fixture
+def core(tmp_path):
+    """
+    Point the core at a temporary data directory with the cache disabled and
+     no retries, the previous settings are restored afterwards.
+    """
+    settings = {name: value for name, value in vars(config).items() if name.startswith("HASHDB_")}
+    config.configure(data_directory=str(tmp_path), use_cache=False, offline=False,
+                     retries=0, retry_backoff=0, request_timeout=5)
+    client.HASHDB_BULK_UNSUPPORTED.clear()
+    yield config
+    close_session()
+    close_cache()
+    close_hash_indexes()
+    client.HASHDB_BULK_UNSUPPORTED.clear()
+    vars(config).update(settings)
+
+
+@pytest.fixture
+def server():
+    mock_server = MockHashDBServer().start()
+    yield mock_server
+    mock_server.stop()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from hashdb_core import HashCache
+from hashdb_core import cache as cache_module
+
+API_URL = "http://hashdb.test"
+HASHES = [{"hash": 1, "string": {"string": "Sleep"}}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def hash_cache(tmp_path, clock):
+    hash_cache = HashCache(str(tmp_path / "cache.sqlite"), ttl=100, negative_ttl=10, max_entries=3)
+    yield hash_cache
+    hash_cache.close()
+
+
+def test_get_put(hash_cache):
+    assert hash_cache.get(API_URL, "crc32", 1) is None
+    hash_cache.put(API_URL, "crc32", 1, HASHES)
+    assert hash_cache.get(API_URL, "crc32", 1) == HASHES
+    assert hash_cache.get(API_URL, "djb2", 1) is None
+    assert hash_cache.get("http://other.test", "crc32", 1) is None
+
+
+def test_ttl(hash_cache, clock):
+    hash_cache.put(API_URL, "crc32", 1, HASHES)
+    clock.now += 99
+    assert hash_cache.get(API_URL, "crc32", 1) == HASHES
+    clock.now += 2
+    assert hash_cache.get(API_URL, "crc32", 1) is None
+
+
+def test_negative_ttl(hash_cache, clock):
+    hash_cache.put(API_URL, "crc32", 2, [])
+    clock.now += 9
+    assert hash_cache.get(API_URL, "crc32", 2) == []
+    clock.now += 2
+    assert hash_cache.get(API_URL, "crc32", 2) is None
+
+
+def test_lru_eviction(hash_cache, clock):
+    hash_cache.EVICTION_INTERVAL = 1
+    for hash_value in (1, 2, 3):
+        clock.now += 1
+        hash_cache.put(API_URL, "crc32", hash_value, HASHES)
+    # Reading the oldest entry makes the second one the least recently used
+    clock.now += 1
+    assert hash_cache.get(API_URL, "crc32", 1) == HASHES
+    clock.now += 1
+    hash_cache.put(API_URL, "crc32", 4, HASHES)
+    assert [hash_cache.get(API_URL, "crc32", hash_value) is not None for hash_value in (1, 2, 3, 4)] == \
+           [True, False, True, True]
+
+
+def test_module_chunks(hash_cache):
+    hash_cache.MODULE_CHUNK_SIZE = 2
+    entries = [{"hash": index, "string": {"string": "Api_%x" % index}} for index in range(5)]
+    assert hash_cache.iter_module(API_URL, "kernel32", "crc32", "api") is None
+    hash_cache.put_module(API_URL, "Kernel32", "crc32", "api", {"hashes": entries})
+    assert list(hash_cache.iter_module(API_URL, "kernel32", "crc32", "api")) == entries
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from hashdb_core import client, get_strings_from_hashes, hunt_hashes, iter_json_array
+
+XOR_KEY = 0x1234
+
+
+class StreamedResponse:
+    """Stands in for a streamed `requests.Response`, served in fixed size chunks."""
+    def __init__(self, payload: bytes, chunk_size: int):
+        self.payload = payload
+        self.chunk_size = chunk_size
+
+    def iter_content(self, chunk_size: int = 1):
+        for start in range(0, len(self.payload), self.chunk_size):
+            yield self.payload[start:start + self.chunk_size]
+
+
+def mock_hashes(hash_value: int) -> list:
+    name = "Api_%x" % hash_value
+    return [{"hash": hash_value,
+             "string": {"string": name, "is_api": True, "permutation": "api", "api": name, "modules": ["mockmodule"]}}]
+
+
+ITEMS = [{"hash": 1, "string": {"string": "Sleep", "note": "[brackets], \"quotes\" and {braces}"}},
+         {"hash": 2, "string": {"string": "élève ☃"}},
+         {"hash": 3.5, "string": None},
+         [1, [2, 3]],
+         12345678901234567890]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 4096])
+def test_iter_json_array_chunk_boundaries(chunk_size):
+    payload = json.dumps({"before": {"hashes": "not this one"}, "hashes": ITEMS, "after": [0]}, ensure_ascii=False).encode()
+    assert list(iter_json_array(StreamedResponse(payload, chunk_size), "hashes")) == ITEMS
+
+
+@pytest.mark.parametrize("payload", [b'{"hashes": []}', b'{"other": [1]}', b'{}'])
+def test_iter_json_array_empty(payload):
+    assert list(iter_json_array(StreamedResponse(payload, 3), "hashes")) == []
+
+
+def test_bulk_lookup(core, server):
+    values = list(range(1, 251))
+    results = get_strings_from_hashes("mock_hash32", values, api_url=server.url, batch_size=100)
+    assert results == {value: mock_hashes(value) for value in values}
+    assert server.request_count == 3
+
+
+def test_xor(core, server):
+    values = [value ^ XOR_KEY for value in (0x10, 0x20)]
+    results = get_strings_from_hashes("mock_hash32", values, XOR_KEY, api_url=server.url)
+    assert results == {0x10 ^ XOR_KEY: mock_hashes(0x10), 0x20 ^ XOR_KEY: mock_hashes(0x20)}
+
+
+def test_xor_local(core, server):
+    # crc32("GetProcAddress") is resolved by the local engine without any requests
+    results = get_strings_from_hashes("crc32", [0xC97C1FFF ^ XOR_KEY], XOR_KEY, api_url=server.url)
+    assert results[0xC97C1FFF ^ XOR_KEY][0]["string"]["api"] == "GetProcAddress"
+    assert server.request_count == 0
+
+
+def test_bulk_unsupported_fallback(core, server):
+    server.bulk = False
+    values = list(range(1, 21))
+    results = get_strings_from_hashes("mock_hash32", values, api_url=server.url, batch_size=100, error_budget=0)
+    assert results == {value: mock_hashes(value) for value in values}
+    assert server.url in client.HASHDB_BULK_UNSUPPORTED
+    # One rejected bulk request, then single lookups only
+    assert server.request_count == 1 + len(values)
+    server.reset_counters()
+    get_strings_from_hashes("mock_hash32", [100], api_url=server.url)
+    assert server.request_count == 1
+
+
+def test_error_budget(core, server):
+    server.error_rate = 1.0
+    core.configure(fallback_workers=2)
+    values = list(range(1, 201))
+    results = get_strings_from_hashes("mock_hash32", values, api_url=server.url, batch_size=100, error_budget=3)
+    assert results == {}
+    # Two failed bulk requests and a few single lookups (plus those in flight) until
+    #  the budget is exhausted, the remaining lookups are never sent
+    assert server.request_count < len(values) // 4
+
+
+def test_cancel(core, server):
+    calls = []
+    def progress_callback(resolved: int, total: int) -> bool:
+        calls.append((resolved, total))
+        return False
+    values = list(range(1, 51))
+    results = get_strings_from_hashes("mock_hash32", values, api_url=server.url, batch_size=10,
+                                      progress_callback=progress_callback)
+    assert results == {value: mock_hashes(value) for value in values[:10]}
+    assert calls == [(10, 50)]
+    assert server.request_count == 1
+
+
+def test_cache(core, server):
+    core.configure(use_cache=True)
+    values = [1, 2, 3]
+    first = get_strings_from_hashes("mock_hash32", values, api_url=server.url)
+    second = get_strings_from_hashes("mock_hash32", values, api_url=server.url)
+    assert first == second
+    assert server.request_count == 1
+
+
+def test_hunt_hashes(core, server):
+    server.hunt_hits = 2
+    assert hunt_hashes([1, 2, 2, 3], api_url=server.url) == [("mock_hash32", 3), ("crc32", 3)]
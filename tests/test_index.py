@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import struct
+
+import pytest
+
+from hashdb_core import HashDBError, HashIndex, get_hash_index, get_index_directory, get_strings_from_hashes
+
+
+def test_write_lookup(tmp_path):
+    path = str(tmp_path / "crc32.hdbi")
+    entries = [(7, "seven"), (3, {"string": "three"}), (7, "sept"), (0xFFFFFFFF, "max")]
+    assert HashIndex.write(path, 4, entries) == len(entries)
+    index = HashIndex(path)
+    try:
+        assert index.lookup(3) == [{"hash": 3, "string": {"string": "three"}}]
+        assert sorted(result["string"] for result in index.lookup(7)) == ["sept", "seven"]
+        assert index.lookup(0xFFFFFFFF) == [{"hash": 0xFFFFFFFF, "string": "max"}]
+        assert index.lookup(0) == []
+        assert index.lookup(5) == []
+    finally:
+        index.close()
+
+
+def test_write_lookup_64(tmp_path):
+    path = str(tmp_path / "fnv1a_64.hdbi")
+    HashIndex.write(path, 8, [(0xAF63DC4C8601EC8C, "a")])
+    index = HashIndex(path)
+    try:
+        assert index.lookup(0xAF63DC4C8601EC8C) == [{"hash": 0xAF63DC4C8601EC8C, "string": "a"}]
+    finally:
+        index.close()
+
+
+def test_long_strings(tmp_path):
+    # Longer than the 16 bit length field of the first index version
+    path = str(tmp_path / "crc32.hdbi")
+    HashIndex.write(path, 4, [(1, "x" * 0x10001)])
+    index = HashIndex(path)
+    try:
+        assert index.lookup(1)[0]["string"] == "x" * 0x10001
+    finally:
+        index.close()
+
+
+def test_version_mismatch(tmp_path):
+    path = str(tmp_path / "crc32.hdbi")
+    HashIndex.write(path, 4, [(1, "one")])
+    with open(path, "r+b") as index_file:
+        index_file.seek(4)
+        index_file.write(struct.pack("<H", HashIndex.VERSION - 1))
+    with pytest.raises(HashDBError):
+        HashIndex(path)
+
+
+def test_lookups_use_the_index(core, server):
+    HashIndex.write("{}/mock_hash32.hdbi".format(get_index_directory()), 4, [(0x1234, "Indexed")])
+    assert get_hash_index("mock_hash32") is not None
+    results = get_strings_from_hashes("mock_hash32", [0x1234], api_url=server.url)
+    assert results == {0x1234: [{"hash": 0x1234, "string": "Indexed"}]}
+    assert server.request_count == 0
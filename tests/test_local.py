@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from hashdb_core import LOCAL_ALGORITHMS, hunt_local_hashes, solve_xor_key
+
+# Published test vectors (FNV reference suite, CRC-32 check value, djb2/sdbm
+#  worked by hand) and the well known shellcode hashes of GetProcAddress
+KNOWN_VECTORS = [
+    ("crc32", b"123456789", 0xCBF43926),
+    ("crc32", b"GetProcAddress", 0xC97C1FFF),
+    ("djb2", b"a", 177670),
+    ("djb2", b"hello", 261238937),
+    ("sdbm", b"a", 97),
+    ("sdbm", b"ab", 6363201),
+    ("fnv1_32", b"a", 0x050C5D7E),
+    ("fnv1_32", b"foobar", 0x31F0B262),
+    ("fnv1a_32", b"a", 0xE40C292C),
+    ("fnv1a_32", b"foobar", 0xBF9CF968),
+    ("fnv1_64", b"a", 0xAF63BD4C8601B7BE),
+    ("fnv1_64", b"foobar", 0x340D8765A4DDA9C2),
+    ("fnv1a_64", b"a", 0xAF63DC4C8601EC8C),
+    ("fnv1a_64", b"foobar", 0x85944171F73967E8),
+    ("ror13_add", b"GetProcAddress", 0x7C0DFCAA),
+]
+
+XOR_KEY = 0x1234
+CRC32_APIS = {"GetProcAddress": 0xC97C1FFF, "LoadLibraryA": 0x3FC1BD8D, "Sleep": 0xCEF2EDA8}
+
+
+@pytest.mark.parametrize("algorithm, data, expected", KNOWN_VECTORS)
+def test_known_vectors(algorithm, data, expected):
+    assert LOCAL_ALGORITHMS[algorithm][0](data) == expected
+
+
+def test_every_algorithm_has_a_vector():
+    assert set(LOCAL_ALGORITHMS) == {algorithm for algorithm, _, _ in KNOWN_VECTORS}
+
+
+def test_hunt_local_hashes(core):
+    values = [value ^ XOR_KEY for value in CRC32_APIS.values()]
+    assert hunt_local_hashes(values, XOR_KEY)[0] == ("crc32", len(values))
+    assert hunt_local_hashes(values) == []
+
+
+def test_solve_xor_key(core):
+    values = [value ^ XOR_KEY for value in CRC32_APIS.values()]
+    assert solve_xor_key(values, "crc32")[0] == ("crc32", XOR_KEY, len(values))
+    assert solve_xor_key(values)[0] == ("crc32", XOR_KEY, len(values))
+
+
+def test_solve_xor_key_unxored(core):
+    assert solve_xor_key(list(CRC32_APIS.values()), "crc32")[0] == ("crc32", 0, len(CRC32_APIS))
+
+
+def test_solve_xor_key_needs_three_hits(core):
+    # Two values always agree on a key (and its swapped twin), that isn't a solution
+    values = [CRC32_APIS["GetProcAddress"] ^ XOR_KEY, CRC32_APIS["LoadLibraryA"] ^ XOR_KEY]
+    assert solve_xor_key(values, "crc32") == []
+
+
+def test_solve_xor_key_cancel(core):
+    values = [value ^ XOR_KEY for value in CRC32_APIS.values()]
+    progress = []
+    def progress_callback(done: int, total: int) -> bool:
+        progress.append((done, total))
+        return False
+    solve_xor_key(values, progress_callback=progress_callback)
+    assert progress == [(1, len(LOCAL_ALGORITHMS))]